@@ -1,25 +1,57 @@
 # api_pipeline.py
 from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
-import cv2
+from fastapi.responses import ORJSONResponse
 import numpy as np
-import os
 from ultralytics import YOLO
-from app.ocr_utils import extract_text_with_easyocr, clean_ocr_text, parse_lab_test_line
+from app.ocr_utils import (
+    CUDA_AVAILABLE,
+    decode_image_bytes,
+    clean_ocr_text,
+    parse_lab_test_line,
+    read_upload_bytes,
+    MAX_UPLOAD_BYTES,
+    run_in_ocr_executor,
+    warmup_reader
+)
+from app.detection_utils import (
+    MAX_DETECTION_SIDE,
+    collect_detections,
+    group_detections_by_rows,
+    model_input_side,
+    resize_for_detection
+)
 from app.parser import MedicalDocumentParser
+from app.yolo_batcher import YoloBatcher
 import logging
+import re
+from operator import itemgetter
+from dataclasses import asdict
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
-# Load model and parser
-model = YOLO("C:/Users/Aditya/Desktop/lab_report_yolo_dataset/runs/detect/train3/weights/best.pt")
+# Parser; the YOLO model is loaded per worker process at startup
 parser = MedicalDocumentParser()
+model = None
+yolo_batcher = None
+DETECTION_SIDE = MAX_DETECTION_SIDE
 
-CLASS_NAMES = ['Test_Name', 'Test_Value', 'Test_Unit', 'Flag', 'Ref_Range']
+def load_yolo_model():
+    """Load the YOLO model and start its batcher in the serving process."""
+    global model, yolo_batcher, DETECTION_SIDE
+    model = YOLO("C:/Users/Aditya/Desktop/lab_report_yolo_dataset/runs/detect/train3/weights/best.pt")
+    yolo_batcher = YoloBatcher(model, half=CUDA_AVAILABLE, verbose=False)
+    DETECTION_SIDE = model_input_side(model)
+
+@app.on_event("startup")
+async def warmup_models():
+    """Load and warm up the YOLO model and the OCR reader before serving requests."""
+    load_yolo_model()
+    yolo_batcher.warmup()
+    warmup_reader()
 
 @app.get("/health")
 async def health_check():
@@ -42,39 +74,16 @@ async def root():
 
 @app.post("/predict")
 async def predict_lab_report(file: UploadFile = File(...)):
-    contents = await file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    contents = await read_upload_bytes(file)
+    if contents is None:
+        return ORJSONResponse(status_code=413, content={"error": f"Uploaded file exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"})
+    image = decode_image_bytes(contents)
 
-    results = model(image)[0]
+    detection_image, scale = resize_for_detection(image, DETECTION_SIDE)
+    results = await yolo_batcher.submit(detection_image)
     
     # Extract all detected bounding boxes with their classes and confidence scores
-    detections = []
-    for i, box in enumerate(results.boxes):
-        cls_id = int(box.cls[0])
-        confidence = float(box.conf[0])
-        label = CLASS_NAMES[cls_id]
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        
-        # Crop the detected region
-        crop = image[y1:y2, x1:x2]
-        
-        # Save crop temporarily for OCR
-        temp_path = f"temp_crop_{i}.png"
-        cv2.imwrite(temp_path, crop)
-        
-        # Extract text from the crop
-        ocr_text = extract_text_with_easyocr(temp_path)
-        os.remove(temp_path)
-        
-        if ocr_text.strip():
-            detections.append({
-                'label': label,
-                'text': ocr_text.strip(),
-                'bbox': (x1, y1, x2, y2),
-                'confidence': confidence,
-                'y_center': (y1 + y2) / 2  # For row alignment
-            })
+    detections = await run_in_ocr_executor(collect_detections, results, image, scale=scale)
     
     logger.info(f"Detected {len(detections)} text regions")
     
@@ -84,7 +93,7 @@ async def predict_lab_report(file: UploadFile = File(...)):
     # Process each row to extract structured data
     extracted_results = []
     for row_idx, row_detections in enumerate(rows):
-        logger.info(f"Processing row {row_idx}: {row_detections}")
+        logger.debug("Processing row %d: %s", row_idx, row_detections)
         
         # Try multiple approaches to extract test data from this row
         result = extract_test_data_from_row(row_detections, row_idx)
@@ -96,43 +105,21 @@ async def predict_lab_report(file: UploadFile = File(...)):
         logger.info("No structured results found, trying fallback approach")
         extracted_results = fallback_extraction(detections)
     
-    return JSONResponse(content=extracted_results)
+    return ORJSONResponse(content=extracted_results)
 
 @app.post("/debug-extract")
 async def debug_extract_lab_report(file: UploadFile = File(...)):
     """Debug endpoint that returns detailed information about the extraction process."""
-    contents = await file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    contents = await read_upload_bytes(file)
+    if contents is None:
+        return ORJSONResponse(status_code=413, content={"error": f"Uploaded file exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"})
+    image = decode_image_bytes(contents)
 
-    results = model(image)[0]
+    detection_image, scale = resize_for_detection(image, DETECTION_SIDE)
+    results = await yolo_batcher.submit(detection_image)
     
     # Extract all detected bounding boxes with their classes and confidence scores
-    detections = []
-    for i, box in enumerate(results.boxes):
-        cls_id = int(box.cls[0])
-        confidence = float(box.conf[0])
-        label = CLASS_NAMES[cls_id]
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        
-        # Crop the detected region
-        crop = image[y1:y2, x1:x2]
-        
-        # Save crop temporarily for OCR
-        temp_path = f"temp_crop_{i}.png"
-        cv2.imwrite(temp_path, crop)
-        
-        # Extract text from the crop
-        ocr_text = extract_text_with_easyocr(temp_path)
-        os.remove(temp_path)
-        
-        detections.append({
-            'label': label,
-            'text': ocr_text.strip(),
-            'bbox': (x1, y1, x2, y2),
-            'confidence': confidence,
-            'y_center': (y1 + y2) / 2
-        })
+    detections = await run_in_ocr_executor(collect_detections, results, image, keep_empty=True, scale=scale)
     
     # Group detections by rows
     rows = group_detections_by_rows(detections)
@@ -146,16 +133,16 @@ async def debug_extract_lab_report(file: UploadFile = File(...)):
     }
     
     for row_idx, row_detections in enumerate(rows):
+        row_text = reconstruct_row_text(row_detections)
         row_info = {
             'row_index': row_idx,
             'detections': row_detections,
-            'reconstructed_text': reconstruct_row_text(row_detections),
+            'reconstructed_text': row_text,
             'field_mapping': map_detections_to_fields(row_detections),
             'parsing_attempts': []
         }
         
         # Try different parsing strategies
-        row_text = reconstruct_row_text(row_detections)
         if row_text:
             cleaned_text = clean_ocr_text(row_text)
             row_info['cleaned_text'] = cleaned_text
@@ -166,7 +153,7 @@ async def debug_extract_lab_report(file: UploadFile = File(...)):
                 row_info['parsing_attempts'].append({
                     'method': 'medical_parser',
                     'success': True,
-                    'result': result.__dict__
+                    'result': asdict(result)
                 })
             
             # Try OCR utils parser
@@ -184,33 +171,18 @@ async def debug_extract_lab_report(file: UploadFile = File(...)):
     fallback_results = fallback_extraction(detections)
     debug_info['fallback_results'] = fallback_results
     
-    return JSONResponse(content=debug_info)
+    return ORJSONResponse(content=debug_info)
 
-def group_detections_by_rows(detections, y_tolerance=20):
-    """Group detections by their Y-coordinate to identify rows."""
-    if not detections:
-        return []
-    
-    # Sort by Y-coordinate
-    sorted_detections = sorted(detections, key=lambda x: x['y_center'])
-    
-    rows = []
-    current_row = []
-    current_y = sorted_detections[0]['y_center']
-    
-    for detection in sorted_detections:
-        if abs(detection['y_center'] - current_y) <= y_tolerance:
-            current_row.append(detection)
-        else:
-            if current_row:
-                rows.append(current_row)
-            current_row = [detection]
-            current_y = detection['y_center']
-    
-    if current_row:
-        rows.append(current_row)
+# MedicalDocumentParser reads the test value as [\d.]+, so a line without either cannot parse
+_PARSER_VALUE_CHAR_RE = re.compile(r'[\d.]')
+
+def may_parse_test_line(text):
+    """Return False only for text parser.extract_test_data_from_line is certain to reject.
     
-    return rows
+    The parser re-cleans its input, which can turn a lone S/I/l into a digit, so
+    the check runs on that cleaned form (cached, and reused by the parse itself).
+    """
+    return bool(_PARSER_VALUE_CHAR_RE.search(parser.clean_ocr_text(text.strip())))
 
 def extract_test_data_from_row(row_detections, row_idx):
     """Extract test data from a row of detections using multiple strategies."""
@@ -218,13 +190,13 @@ def extract_test_data_from_row(row_detections, row_idx):
     # Strategy 1: Try to reconstruct the full row text and parse it
     row_text = reconstruct_row_text(row_detections)
     if row_text:
-        logger.info(f"Row {row_idx} reconstructed text: {row_text}")
+        logger.debug("Row %d reconstructed text: %s", row_idx, row_text)
         
         # Clean the text
         cleaned_text = clean_ocr_text(row_text)
         
-        # Try parsing with the medical parser
-        result = parser.extract_test_data_from_line(cleaned_text)
+        # Try parsing with the medical parser, unless the row cannot hold a value
+        result = parser.extract_test_data_from_line(cleaned_text) if may_parse_test_line(cleaned_text) else None
         if result:
             return {
                 "test_name": result.test_name,
@@ -239,9 +211,8 @@ def extract_test_data_from_row(row_detections, row_idx):
     if field_mapping:
         return create_result_from_fields(field_mapping)
     
-    # Strategy 3: Use OCR utils parser
-    if row_text:
-        cleaned_text = clean_ocr_text(row_text)
+    # Strategy 3: Use OCR utils parser; its patterns need a digit in the value
+    if row_text and any(ch.isdigit() for ch in cleaned_text):
         parsed = parse_lab_test_line(cleaned_text)
         if parsed:
             return {
@@ -255,22 +226,18 @@ def extract_test_data_from_row(row_detections, row_idx):
     return None
 
 def reconstruct_row_text(row_detections):
-    """Reconstruct the full text of a row from individual detections."""
-    # Sort detections by X-coordinate (left to right)
-    sorted_detections = sorted(row_detections, key=lambda x: x['bbox'][0])
-    
-    # Combine all text from the row
-    texts = []
-    for detection in sorted_detections:
-        texts.append(detection['text'])
+    """Reconstruct the full text of a row from individual detections.
     
-    return " ".join(texts)
+    Rows from group_detections_by_rows are already ordered left to right.
+    """
+    return " ".join(detection['text'] for detection in row_detections)
 
 def map_detections_to_fields(row_detections):
     """Map individual detections to specific fields based on their labels."""
     field_mapping = {}
     
-    for detection in row_detections:
+    # Visit the most confident detections first so they win each field
+    for detection in sorted(row_detections, key=itemgetter('confidence'), reverse=True):
         label = detection['label']
         text = detection['text']
         
@@ -301,21 +268,23 @@ def fallback_extraction(detections):
     """Fallback extraction when structured parsing fails."""
     results = []
     
-    # Group all detections by approximate Y-coordinate
-    y_groups = {}
-    for detection in detections:
-        y_key = round(detection['y_center'] / 20) * 20  # Group by 20-pixel intervals
-        if y_key not in y_groups:
-            y_groups[y_key] = []
-        y_groups[y_key].append(detection)
+    if not detections:
+        return results
+    
+    # Group all detections by approximate Y-coordinate (20-pixel intervals),
+    # ordered left to right within each group by a single lexsort
+    ys = np.fromiter((d['y_center'] for d in detections), dtype=np.float32, count=len(detections))
+    xs = np.fromiter((d['x1'] for d in detections), dtype=np.float32, count=len(detections))
+    _, bucket_ids = np.unique(np.rint(ys / 20), return_inverse=True)
+    order = np.lexsort((xs, bucket_ids))
+    breaks = np.flatnonzero(np.diff(bucket_ids[order])) + 1
     
     # Process each group
-    for y_key, group_detections in y_groups.items():
-        # Sort by X-coordinate
-        sorted_detections = sorted(group_detections, key=lambda x: x['bbox'][0])
-        
+    for group in np.split(order, breaks):
         # Combine text
-        combined_text = " ".join([d['text'] for d in sorted_detections])
+        combined_text = " ".join([detections[i]['text'] for i in group])
+        if not may_parse_test_line(combined_text):
+            continue
         
         # Try to parse with medical parser
         result = parser.extract_test_data_from_line(combined_text)
@@ -0,0 +1,139 @@
+# app/detection_utils.py
+import cv2
+import numpy as np
+from .ocr_utils import extract_text_batch
+
+CLASS_NAMES = ['Test_Name', 'Test_Value', 'Test_Unit', 'Flag', 'Ref_Range']
+
+# Longest side fed to YOLO; larger uploads are downscaled first
+MAX_DETECTION_SIDE = 1280
+
+def model_input_side(model, default=640):
+    """Return the longest side of the input size a YOLO checkpoint was trained at.
+
+    Ultralytics letterboxes every image down to this size anyway, so resizing to it
+    up front means the frame is only resized once.
+    """
+    imgsz = getattr(model, 'overrides', {}).get('imgsz', default)
+    if isinstance(imgsz, (list, tuple)):
+        imgsz = max(imgsz)
+    return int(imgsz)
+
+def resize_for_detection(image, max_side=MAX_DETECTION_SIDE):
+    """Downscale an image so its longest side is at most max_side.
+
+    Returns the image to run detection on and the scale factor that was applied,
+    so box coordinates can be mapped back onto the original image.
+    """
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return image, 1.0
+    resized = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return resized, scale
+
+def suppress_duplicate_boxes(xyxy, confs, cls_ids, iou_threshold=0.5):
+    """Return the indices of boxes that survive same-class duplicate suppression.
+
+    Works on the raw YOLO ``xyxy``/``conf``/``cls`` arrays before anything is
+    cropped, so duplicates never reach OCR. Pairwise IoU is computed for all boxes
+    at once with NumPy broadcasting, then a greedy NMS pass in descending confidence
+    order keeps the best box of each overlapping same-class cluster. The kept
+    indices are returned in ascending (input) order.
+    """
+    n = len(cls_ids)
+    if n < 2:
+        return np.arange(n)
+
+    boxes = np.asarray(xyxy, dtype=np.float32)
+    confs = np.asarray(confs, dtype=np.float32)
+    cls_ids = np.asarray(cls_ids)
+
+    x1, y1, x2, y2 = boxes.T
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    inter_w = np.clip(np.minimum(x2[:, None], x2[None, :]) - np.maximum(x1[:, None], x1[None, :]), 0, None)
+    inter_h = np.clip(np.minimum(y2[:, None], y2[None, :]) - np.maximum(y1[:, None], y1[None, :]), 0, None)
+    inter = inter_w * inter_h
+    iou = inter / np.maximum(areas[:, None] + areas[None, :] - inter, 1e-6)
+    overlaps = (iou > iou_threshold) & (cls_ids[:, None] == cls_ids[None, :])
+
+    order = np.argsort(-confs, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+
+    keep = np.ones(n, dtype=bool)
+    for i in order:
+        if keep[i]:
+            keep &= ~(overlaps[i] & (rank > rank[i]))
+
+    return np.flatnonzero(keep)
+
+def collect_detections(results, image, keep_empty=False, scale=1.0):
+    """Crop every YOLO box and OCR all crops in a single batched call.
+    
+    ``scale`` is the factor the image was resized by before detection; boxes
+    are mapped back by it so crops come from the full-resolution image.
+    """
+    # Fetch all boxes in one device-to-host transfer: xyxy, (track id,) conf, cls per row
+    data = results.boxes.data.cpu().numpy()
+    xyxy = (data[:, :4] / scale).astype(np.int32)
+    confs = data[:, -2]
+    cls_ids = data[:, -1].astype(np.int32)
+    
+    # Drop overlapping duplicates of the same field before cropping, keeping the most confident box
+    kept = suppress_duplicate_boxes(xyxy, confs, cls_ids)
+    
+    boxes = []
+    crops = []
+    for i in kept.tolist():
+        label = CLASS_NAMES[cls_ids[i]]
+        x1, y1, x2, y2 = xyxy[i].tolist()
+        
+        boxes.append((label, (x1, y1, x2, y2), float(confs[i])))
+        crops.append(image[y1:y2, x1:x2])
+    
+    # OCR all crops in one batched call
+    texts = extract_text_batch(crops)
+    
+    detections = []
+    for (label, bbox, confidence), ocr_text in zip(boxes, texts):
+        if ocr_text.strip() or keep_empty:
+            detections.append({
+                'label': label,
+                'text': ocr_text.strip(),
+                'bbox': bbox,
+                'x1': bbox[0],
+                'confidence': confidence,
+                'y_center': (bbox[1] + bbox[3]) / 2  # For row alignment
+            })
+    
+    return detections
+
+def group_detections_by_rows(detections, y_tolerance=20):
+    """Group detections by their Y-coordinate to identify rows."""
+    if not detections:
+        return []
+    
+    n = len(detections)
+    ys = np.fromiter((d['y_center'] for d in detections), dtype=np.float64, count=n)
+    xs = np.fromiter((d['x1'] for d in detections), dtype=np.float64, count=n)
+    
+    # Walk top to bottom; a detection more than y_tolerance below the first
+    # detection of the current row starts a new row
+    y_order = np.argsort(ys, kind='stable')
+    sorted_ys = ys[y_order].tolist()
+    row_start = sorted_ys[0]
+    row = 0
+    row_ids = []
+    for y in sorted_ys:
+        if y - row_start > y_tolerance:
+            row += 1
+            row_start = y
+        row_ids.append(row)
+    row_ids = np.array(row_ids, dtype=np.int64)
+    
+    # One lexsort orders by row, then by X within the row; equal X keeps the Y order
+    order = y_order[np.lexsort((xs[y_order], row_ids))]
+    breaks = np.flatnonzero(np.diff(row_ids)) + 1
+    
+    return [[detections[i] for i in group] for group in np.split(order, breaks)]
@@ -1,27 +1,39 @@
 # app/main.py
 
+import asyncio
+import hashlib
 import os
-import time
+from collections import OrderedDict
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import ORJSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.ocr_utils import (
+    decode_image_bytes,
     extract_text_with_easyocr,
-    clean_ocr_text,
-    parse_lab_test_line,
     extract_structured_lab_data,
-    split_ocr_text_into_lines
+    iter_ocr_text_lines,
+    read_upload_bytes,
+    MAX_UPLOAD_BYTES,
+    run_in_ocr_executor,
+    warmup_reader
 )
-from app.result_formatter import format_result, is_test_out_of_range
+from app.result_formatter import format_results
 from app.parser import MedicalDocumentParser
+from app.detection_utils import (
+    MAX_DETECTION_SIDE,
+    collect_detections,
+    group_detections_by_rows,
+    model_input_side,
+    resize_for_detection
+)
 from app.pdf_utils import create_lab_report_pdf, PDF_OUTPUT_DIR
+from app.yolo_batcher import MAX_BATCH_SIZE, YoloBatcher
 from fastapi.exceptions import RequestValidationError
 from starlette.requests import Request
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
-import cv2
-import numpy as np
 from ultralytics import YOLO
 import logging
+from operator import itemgetter
 import torch
 
 # Set up logging
@@ -35,7 +47,7 @@ if CUDA_AVAILABLE:
 else:
     logger.info("CUDA is not available. Using CPU.")
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -49,18 +61,61 @@ app.add_middleware(
 # Initialize both parsers
 parser = MedicalDocumentParser()
 
-# Load YOLO model
-try:
-    model = YOLO("C:/Users/Aditya/Desktop/lab_report_yolo_dataset/runs/detect/train3/weights/best.pt")
-    if CUDA_AVAILABLE:
-        model.to('cuda')  # Move model to GPU if available
-    YOLO_AVAILABLE = True
-    logger.info(f"YOLO model loaded successfully on {'GPU' if CUDA_AVAILABLE else 'CPU'}")
-except Exception as e:
-    YOLO_AVAILABLE = False
-    logger.warning(f"Could not load YOLO model: {str(e)}")
+# YOLO model, loaded per worker process at startup
+model = None
+yolo_batcher = None
+DETECTION_SIDE = MAX_DETECTION_SIDE
+YOLO_AVAILABLE = False
+
+def load_yolo_model():
+    """Load the YOLO model and start its batcher in the serving process."""
+    global model, yolo_batcher, DETECTION_SIDE, YOLO_AVAILABLE
+    try:
+        model = YOLO("C:/Users/Aditya/Desktop/lab_report_yolo_dataset/runs/detect/train3/weights/best.pt")
+        if CUDA_AVAILABLE:
+            model.to('cuda')  # Move model to GPU if available
+        yolo_batcher = YoloBatcher(model, max_batch_size=MAX_BATCH_SIZE, half=CUDA_AVAILABLE, verbose=False)
+        DETECTION_SIDE = model_input_side(model)
+        YOLO_AVAILABLE = True
+        logger.info(f"YOLO model loaded successfully on {'GPU' if CUDA_AVAILABLE else 'CPU'}")
+    except Exception as e:
+        YOLO_AVAILABLE = False
+        logger.warning(f"Could not load YOLO model: {str(e)}")
+
+# Bound how many uploads are decoded and in the YOLO/OCR pipeline at once. Never
+# below a full YOLO batch, so the slots can't keep the batcher from filling one
+MAX_CONCURRENT_PIPELINES = max(MAX_BATCH_SIZE, os.cpu_count() or 1)
+PIPELINE_SLOTS = asyncio.Semaphore(MAX_CONCURRENT_PIPELINES)
 
-CLASS_NAMES = ['Test_Name', 'Test_Value', 'Test_Unit', 'Flag', 'Ref_Range']
+# Extracted rows for recently seen uploads, keyed by a hash of the raw bytes
+EXTRACTION_CACHE_SIZE = 64
+_extraction_cache = OrderedDict()
+
+def upload_digest(contents):
+    """Hash raw upload bytes into a compact cache key."""
+    return hashlib.blake2b(contents, digest_size=16).digest()
+
+def get_cached_extraction(key):
+    """Return (data, from_yolo) for a previously processed upload, or None."""
+    entry = _extraction_cache.get(key)
+    if entry is not None:
+        _extraction_cache.move_to_end(key)
+    return entry
+
+def cache_extraction(key, data, from_yolo):
+    """Remember the rows extracted for an upload, evicting the least recently used entry."""
+    _extraction_cache[key] = (data, from_yolo)
+    _extraction_cache.move_to_end(key)
+    if len(_extraction_cache) > EXTRACTION_CACHE_SIZE:
+        _extraction_cache.popitem(last=False)
+
+@app.on_event("startup")
+async def warmup_models():
+    """Load and warm up the YOLO model and the OCR reader before serving requests."""
+    load_yolo_model()
+    if YOLO_AVAILABLE:
+        yolo_batcher.warmup()
+    warmup_reader()
 
 @app.post("/extract-lab-tests")
 async def extract_lab_tests(
@@ -71,7 +126,7 @@ async def extract_lab_tests(
     logger.info(f"Received file: {file.filename}, Content-Type: {file.content_type}")
     
     if not file.content_type or not file.content_type.startswith("image/"):
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=400,
             content={
                 "is_success": False,
@@ -80,55 +135,72 @@ async def extract_lab_tests(
         )
     
     try:
-        temp_path = f"_temp_{file.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(await file.read())
-            
-        try:
-            # Try YOLO-based extraction first if available
-            if YOLO_AVAILABLE:
-                try:
-                    image = cv2.imread(temp_path)
-                    results = model(image)[0]
-                    structured_results = process_yolo_results(results, image)
-                    if structured_results:
-                        # Generate PDF report with automatic path generation
-                        pdf_path = create_lab_report_pdf(structured_results, patient_name)
-                        
-                        return {
-                            "is_success": True,
-                            "data": structured_results,
-                            "pdf_path": os.path.basename(pdf_path),  # Only return filename
-                            "pdf_directory": "C:\\Users\\Aditya\\Desktop\\pdf reports"  # Add PDF directory info
+        contents = await read_upload_bytes(file)
+        if contents is None:
+            return ORJSONResponse(
+                status_code=413,
+                content={
+                    "is_success": False,
+                    "error": f"Uploaded file exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"
+                }
+            )
+        # Re-submitted uploads reuse the rows extracted the first time
+        cache_key = await asyncio.to_thread(upload_digest, contents)
+        cached = get_cached_extraction(cache_key)
+        if cached is not None:
+            data, from_yolo = cached
+        else:
+            async with PIPELINE_SLOTS:
+                image = await asyncio.to_thread(decode_image_bytes, contents)
+                if image is None:
+                    return ORJSONResponse(
+                        status_code=400,
+                        content={
+                            "is_success": False,
+                            "error": "Could not decode the uploaded image"
                         }
-                except Exception as e:
-                    logger.warning(f"YOLO extraction failed, falling back to OCR: {str(e)}")
-            
-            # Fallback to direct OCR
-            recognized_text = extract_text_with_easyocr(temp_path)
+                    )
             
-            # Process OCR results
-            lines = split_ocr_text_into_lines(recognized_text)
-            structured_results = extract_structured_lab_data(lines)
-            data = [format_result(r) for r in structured_results]
+                # Try YOLO-based extraction first if available
+                data = None
+                yolo_failed = False
+                if YOLO_AVAILABLE:
+                    try:
+                        detection_image, scale = await asyncio.to_thread(resize_for_detection, image, DETECTION_SIDE)
+                        results = await yolo_batcher.submit(detection_image)
+                        data = await run_in_ocr_executor(process_yolo_results, results, image, scale)
+                    except Exception as e:
+                        yolo_failed = True
+                        logger.warning(f"YOLO extraction failed, falling back to OCR: {str(e)}")
+                from_yolo = bool(data)
             
-            # Generate PDF report with automatic path generation
-            pdf_path = create_lab_report_pdf(data, patient_name)
-            
-            return {
-                "is_success": True,
-                "data": data,
-                "pdf_path": os.path.basename(pdf_path)  # Only return filename
-            }
+                if not from_yolo:
+                    # Fallback to direct OCR on the decoded image
+                    recognized_text = await run_in_ocr_executor(extract_text_with_easyocr, image)
+                
+                    # Process OCR results, parsing each line as it is joined
+                    structured_results = extract_structured_lab_data(iter_ocr_text_lines(recognized_text))
+                    data = format_results(structured_results)
             
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            # Don't pin a fallback result that only happened because YOLO errored
+            if not yolo_failed:
+                cache_extraction(cache_key, data, from_yolo)
+        
+        # Generate PDF report with automatic path generation
+        pdf_path = await asyncio.to_thread(create_lab_report_pdf, data, patient_name)
+        
+        response = {
+            "is_success": True,
+            "data": data,
+            "pdf_path": os.path.basename(pdf_path)  # Only return filename
+        }
+        if from_yolo:
+            response["pdf_directory"] = PDF_OUTPUT_DIR  # Add PDF directory info
+        return response
                 
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={
                 "is_success": False,
@@ -141,10 +213,10 @@ async def extract_lab_tests(
 async def download_pdf(pdf_filename: str):
     """Download a generated PDF report."""
     # Use the external PDF directory
-    pdf_path = os.path.join("C:\\Users\\Aditya\\Desktop\\pdf reports", pdf_filename)
+    pdf_path = os.path.join(PDF_OUTPUT_DIR, pdf_filename)
     
     # Validate the path is within the allowed directory
-    if not os.path.normpath(pdf_path).startswith("C:\\Users\\Aditya\\Desktop\\pdf reports"):
+    if not os.path.normpath(pdf_path).startswith(os.path.normpath(PDF_OUTPUT_DIR)):
         raise HTTPException(status_code=400, detail="Invalid PDF path")
         
     if os.path.exists(pdf_path):
@@ -157,7 +229,7 @@ async def download_pdf(pdf_filename: str):
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=HTTP_422_UNPROCESSABLE_ENTITY,
         content={"detail": "Invalid request format or data. Please check your request and try again."}
     )
@@ -178,108 +250,32 @@ async def root():
         }
     }
 
-def format_result(res):
-    """Format a test result with improved out-of-range detection."""
-    # Get the raw value and any flag
-    test_value = res.get("value", "")
-    flag = res.get("flag", "")
+def process_yolo_results(results, image, scale=1.0):
+    """Process YOLO detection results and extract structured data.
     
-    # Handle the case where the value might include a flag
-    if isinstance(test_value, str):
-        test_value = test_value.replace('*', '').strip()
-    
-    return {
-        "test_name": res.get("test_name"),
-        "test_value": test_value,
-        "bio_reference_range": res.get("ref_range"),
-        "test_unit": res.get("unit"),
-        "lab_test_out_of_range": is_test_out_of_range(
-            test_value,
-            res.get("ref_range"),
-            flag
-        )
-    }
-
-def process_yolo_results(results, image):
-    """Process YOLO detection results and extract structured data."""
-    detections = []
-    
-    # Convert image to CUDA if available
-    if CUDA_AVAILABLE:
-        image_tensor = torch.from_numpy(image).cuda()
-    
-    for i, box in enumerate(results.boxes):
-        cls_id = int(box.cls[0])
-        confidence = float(box.conf[0])
-        label = CLASS_NAMES[cls_id]
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        
-        # Crop the detected region
-        crop = image[y1:y2, x1:x2]
-        
-        # Save crop temporarily for OCR
-        temp_path = f"temp_crop_{i}.png"
-        cv2.imwrite(temp_path, crop)
-        
-        # Extract text from the crop
-        ocr_text = extract_text_with_easyocr(temp_path)
-        os.remove(temp_path)
-        
-        if ocr_text.strip():
-            detections.append({
-                'label': label,
-                'text': ocr_text.strip(),
-                'bbox': (x1, y1, x2, y2),
-                'confidence': confidence,
-                'y_center': (y1 + y2) / 2
-            })
-    
-    # Clean up CUDA memory if used
-    if CUDA_AVAILABLE:
-        del image_tensor
-        torch.cuda.empty_cache()
+    ``scale`` is the factor the image was resized by before detection; boxes
+    are mapped back by it so crops come from the full-resolution image.
+    """
+    detections = collect_detections(results, image, scale=scale)
     
     # Group detections by rows
     rows = group_detections_by_rows(detections)
     
-    # Process each row
+    # Process each row, then format and range-check every row in one batch
     results = []
     for row_detections in rows:
         result = extract_test_data_from_row(row_detections)
         if result:
             results.append(result)
     
-    return results
-
-def group_detections_by_rows(detections, y_tolerance=20):
-    """Group detections by their Y-coordinate to identify rows."""
-    if not detections:
-        return []
-    
-    sorted_detections = sorted(detections, key=lambda x: x['y_center'])
-    rows = []
-    current_row = []
-    current_y = sorted_detections[0]['y_center']
-    
-    for detection in sorted_detections:
-        if abs(detection['y_center'] - current_y) <= y_tolerance:
-            current_row.append(detection)
-        else:
-            if current_row:
-                rows.append(sorted(current_row, key=lambda x: x['bbox'][0]))
-            current_row = [detection]
-            current_y = detection['y_center']
-    
-    if current_row:
-        rows.append(sorted(current_row, key=lambda x: x['bbox'][0]))
-    
-    return rows
+    return format_results(results)
 
 def extract_test_data_from_row(row_detections):
-    """Extract structured test data from a row of detections."""
+    """Extract the raw fields of a test from a row of detections, in the shape format_results takes."""
     field_mapping = {}
     
-    for detection in row_detections:
+    # Visit detections in ascending confidence so the most confident one of each label is kept
+    for detection in sorted(row_detections, key=itemgetter('confidence')):
         label = detection['label']
         text = detection['text'].strip()
         
@@ -295,18 +291,7 @@ def extract_test_data_from_row(row_detections):
             field_mapping['flag'] = text
     
     if field_mapping.get('test_name') and field_mapping.get('value'):
-        test_value = field_mapping.get('value', '').replace('*', '').strip()
-        return {
-            "test_name": field_mapping.get('test_name'),
-            "test_value": test_value,
-            "bio_reference_range": field_mapping.get('ref_range'),
-            "test_unit": field_mapping.get('unit'),
-            "lab_test_out_of_range": is_test_out_of_range(
-                test_value,
-                field_mapping.get('ref_range'),
-                field_mapping.get('flag', '')
-            )
-        }
+        return field_mapping
     
     return None
 
@@ -1,167 +1,225 @@
 # app/ocr_utils.py
-import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import easyocr
+import numpy as np
 import re
+import string
+import threading
 import torch
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union, Iterator
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize EasyOCR reader once
 CUDA_AVAILABLE = torch.cuda.is_available()
-reader = easyocr.Reader(['en'], gpu=CUDA_AVAILABLE)
-logger.info(f"Initialized EasyOCR with GPU support: {CUDA_AVAILABLE}")
 
-def extract_text_with_easyocr(image_path):
-    """Extract text from an image using EasyOCR with enhanced error handling."""
+class _Float16Autocast(torch.nn.Module):
+    """Run a wrapped network under CUDA float16 autocast and hand back float32 outputs.
+
+    EasyOCR's post-processing (cv2 thresholding of the CRAFT maps, CTC decoding)
+    expects float32, so only the forward pass itself runs at half precision.
+    """
+
+    def __init__(self, module):
+        super().__init__()
+        self.module = module
+
+    def forward(self, *args, **kwargs):
+        with torch.autocast('cuda', dtype=torch.float16):
+            outputs = self.module(*args, **kwargs)
+        if isinstance(outputs, tuple):
+            return tuple(output.float() for output in outputs)
+        return outputs.float()
+
+OCR_FP16 = CUDA_AVAILABLE
+
+# EasyOCR reader, created lazily so each worker process builds its own after startup
+reader = None
+_reader_lock = threading.Lock()
+
+def get_reader():
+    """Return the shared EasyOCR reader, initializing it on first use in this process."""
+    global reader
+    if reader is None:
+        with _reader_lock:
+            if reader is None:
+                ocr_reader = easyocr.Reader(['en'], gpu=CUDA_AVAILABLE, cudnn_benchmark=CUDA_AVAILABLE)
+                if OCR_FP16:
+                    ocr_reader.detector = _Float16Autocast(ocr_reader.detector)
+                    ocr_reader.recognizer = _Float16Autocast(ocr_reader.recognizer)
+                logger.info(f"Initialized EasyOCR with GPU support: {CUDA_AVAILABLE}")
+                reader = ocr_reader
+    return reader
+
+def _use_dedicated_cuda_stream():
+    """Run the calling thread's CUDA work on its own stream instead of the default one."""
+    if CUDA_AVAILABLE:
+        torch.cuda.set_stream(torch.cuda.Stream())
+
+# Single worker so OCR calls are serialized on the shared reader, off the event loop.
+# Its own CUDA stream lets OCR overlap YOLO batches running on the batcher thread.
+OCR_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="easyocr",
+                                  initializer=_use_dedicated_cuda_stream)
+
+async def run_in_ocr_executor(func, *args, **kwargs):
+    """Run a blocking OCR call on the OCR executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(OCR_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+# libjpeg-turbo decoder for JPEG uploads, with cv2.imdecode as fallback
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbojpeg = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except Exception as e:
+    _turbojpeg = None
+    TURBOJPEG_AVAILABLE = False
+    logger.info(f"TurboJPEG not available, using OpenCV for JPEG decoding: {str(e)}")
+
+UPLOAD_CHUNK_SIZE = 1 << 16
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+
+async def read_upload_bytes(file, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                            max_bytes: int = MAX_UPLOAD_BYTES) -> Optional[bytearray]:
+    """Read an UploadFile in chunks into a single growable buffer.
+
+    Returns None as soon as the upload grows past max_bytes, without reading the rest.
+    """
+    contents = bytearray()
+    while chunk := await file.read(chunk_size):
+        contents.extend(chunk)
+        if len(contents) > max_bytes:
+            return None
+    return contents
+
+def decode_image_bytes(contents: bytes) -> Optional[np.ndarray]:
+    """Decode uploaded image bytes into a BGR array, using TurboJPEG for JPEG data."""
+    if TURBOJPEG_AVAILABLE and contents[:3] == b'\xff\xd8\xff':
+        try:
+            return _turbojpeg.decode(contents, pixel_format=TJPF_BGR)
+        except Exception as e:
+            logger.warning(f"TurboJPEG decode failed, falling back to OpenCV: {str(e)}")
+    
+    nparr = np.frombuffer(contents, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def warmup_reader(runs: int = 3, size: int = 640):
+    """Run dummy inferences through the shared reader so the first request runs at steady state."""
+    ocr_reader = get_reader()
+    dummy = np.zeros((size, size, 3), np.uint8)
+    for _ in range(runs):
+        ocr_reader.readtext(dummy)
+    ocr_reader.readtext_batched([dummy, dummy], batch_size=2)
+    if CUDA_AVAILABLE:
+        torch.cuda.synchronize()
+    logger.info("EasyOCR reader warmed up")
+
+def extract_text_with_easyocr(image: Union[np.ndarray, str]):
+    """Extract text from an image array or image path using EasyOCR with enhanced error handling."""
+    source = image if isinstance(image, str) else f"array{image.shape}"
     try:
-        image = cv2.imread(image_path)
-        if image is None:
-            logger.error(f"Could not read image: {image_path}")
-            return ""
+        if isinstance(image, str):
+            image = cv2.imread(image)
+            if image is None:
+                logger.error(f"Could not read image: {source}")
+                return ""
         
         # Check if image is too small or empty
         if image.size == 0 or image.shape[0] < 10 or image.shape[1] < 10:
-            logger.warning(f"Image too small or empty: {image_path}")
+            logger.warning(f"Image too small or empty: {source}")
             return ""
         
-        # Use the global reader instance
-        result = reader.readtext(image, detail=0, paragraph=True)
+        # Use the shared reader instance; EasyOCR accepts BGR arrays directly
+        result = get_reader().readtext(image, detail=0, paragraph=True)
         
-        # Log the result for debugging
-        logger.info(f"EasyOCR result for {image_path}: {result}")
+        # Log the result for debugging; lazy args so nothing is formatted unless DEBUG is on
+        logger.debug("EasyOCR result for %s: %s", source, result)
         
         combined = " ".join(result)
         return combined.strip()
         
     except Exception as e:
-        logger.error(f"Error in OCR extraction for {image_path}: {str(e)}")
+        logger.error(f"Error in OCR extraction for {source}: {str(e)}")
         return ""
 
-def extract_text_with_easyocr_from_crop(image_path, bbox=None):
-    """Extract text from a specific crop of an image."""
+def extract_text_batch(crops: List[np.ndarray]) -> List[str]:
+    """Extract text from a list of image crops with a single batched EasyOCR call.
+
+    EasyOCR's batched path requires every image to share one shape, so each crop
+    is copied (not resized, which would distort the text) into one preallocated
+    white buffer of the largest crop size. Crops are taken as views of the
+    source image, so this copy is the only one. Crops that are too small to
+    read yield "".
+    """
+    texts = [""] * len(crops)
+    valid = [
+        i for i, crop in enumerate(crops)
+        if crop is not None and crop.size > 0 and crop.shape[0] >= 10 and crop.shape[1] >= 10
+    ]
+    if not valid:
+        return texts
+
     try:
-        image = cv2.imread(image_path)
-        if image is None:
-            return ""
-        
-        if bbox:
-            x1, y1, x2, y2 = bbox
-            crop = image[y1:y2, x1:x2]
-        else:
-            crop = image
-        
-        # Save crop temporarily
-        temp_crop_path = f"temp_crop_{os.getpid()}.png"
-        cv2.imwrite(temp_crop_path, crop)
-        
-        # Extract text
-        text = extract_text_with_easyocr(temp_crop_path)
-        
-        # Clean up
-        if os.path.exists(temp_crop_path):
-            os.remove(temp_crop_path)
-        
-        return text
-        
+        max_h = max(crops[i].shape[0] for i in valid)
+        max_w = max(crops[i].shape[1] for i in valid)
+        batch = np.full((len(valid), max_h, max_w, 3), 255, dtype=np.uint8)
+        for slot, i in enumerate(valid):
+            h, w = crops[i].shape[:2]
+            batch[slot, :h, :w] = crops[i]
+
+        results = get_reader().readtext_batched(batch, detail=0, paragraph=True, batch_size=len(batch))
+        for i, result in zip(valid, results):
+            texts[i] = " ".join(result).strip()
+
+        logger.info(f"EasyOCR batched {len(batch)} crops at {max_w}x{max_h}")
+
     except Exception as e:
-        logger.error(f"Error in crop OCR extraction: {str(e)}")
-        return ""
+        logger.error(f"Error in batched OCR extraction: {str(e)}")
 
-def clean_ocr_text(text):
-    """
-    Enhanced OCR text cleaning with medical-specific corrections.
-    """
-    if not text:
-        return ""
-    
-    # Convert to lowercase for consistency
-    text = text.lower()
+    return texts
+
+# Enhanced comprehensive patterns for lab test results
+# Handles various formats like:
+# "MCHC 30.5* 31.5-34.5 gm/dl"
+# "UREA 24.3 19-44 mg/dl"
+# "SODIUM 138.1 135-145 mmol/l"
+# "CREATININE, SERUM 0.91 0.7-1.3"
+_LAB_LINE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    # Pattern 1: Test Name | Value | Flag | Reference Range | Unit
+    r"(?P<test_name>[a-zA-Z\s,]+?)\s+(?P<value>\d+[\.,]?\d*)\s*(?P<flag>[\*HLN])?\s*(?P<ref_range>\d+[\.,]?\d*\s*[-–]\s*\d+[\.,]?\d*)?\s*(?P<unit>[a-zA-Z/%]+)?",
     
-    # Enhanced medical-specific OCR corrections
-    corrections = [
-        # Common OCR character misreads
-        (r"gmldl", "gm/dl"),
-        (r"mgldl", "mg/dl"),
-        (r"mmolll", "mmol/l"),
-        (r"millll", "mmol/l"),
-        (r"milll", "mmol/l"),
-        (r"melhod", "method"),
-        (r"melfiod", "method"),
-        (r"melfiod", "method"),
-        (r"TESL", "TEST"),
-        (r"RETUSERUM", "SERUM"),
-        (r"JRIC", "URIC"),
-        (r"omocresol", "bromocresol"),
-        (r"pholomelric", "photometric"),
-        (r"delermination", "determination"),
-        (r"compensalion", "compensation"),
-        (r"calciilated", "calculated"),
-        (r"calciulated", "calculated"),
-        (r"biuret", "biuret"),
-        (r"meihod", "method"),
-        (r"melliod", "method"),
-        (r"arsenazo", "arsenazo"),
-        (r"molybdale", "molybdate"),
-        (r"endpoint", "endpoint"),
-        (r"enzymalic", "enzymatic"),
-        (r"tbhba", "TBHBA"),
-        (r"glucose", "glucose"),
-        (r"creatinine", "creatinine"),
-        (r"urea", "urea"),
-        (r"sodium", "sodium"),
-        (r"potassium", "potassium"),
-        (r"calcium", "calcium"),
-        (r"phosphorus", "phosphorus"),
-        (r"protein", "protein"),
-        (r"albumin", "albumin"),
-        (r"globulin", "globulin"),
-        
-        # Character corrections
-        (r"\bO\b", "0"),  # Standalone O to 0
-        (r"\bI\b", "1"),  # Standalone I to 1
-        (r"\bl\b", "1"),  # lowercase l to 1
-        (r"(?<=\d)O(?=\s|$)", "0"),  # O to 0 after digits
-        (r"(?<=\d)o(?=\s|$)", "0"),  # o to 0 after digits
-        (r"(?<!\d)S(?=\s|\d)", "5"),  # S to 5 before digits
-        (r"(?<!\d)I(?=\s|\d)", "1"),  # I to 1 before digits
-        
-        # Unit standardizations
-        (r"\bmg\s*%\s*dl\b", "mg/dl"),
-        (r"\bg\s*%\s*dl\b", "g/dl"),
-        (r"\bmmol\s*l\b", "mmol/l"),
-        (r"\biu\s*ml\b", "iu/ml"),
-        (r"\bng\s*ml\b", "ng/ml"),
-        (r"\bpg\s*ml\b", "pg/ml"),
-        (r"\bmcg\s*ml\b", "mcg/ml"),
-        (r"\bcells\s*ul\b", "cells/ul"),
-        (r"\bthousand\s*ul\b", "thousand/ul"),
-        (r"\bmillion\s*ul\b", "million/ul"),
-        
-        # Range separators
-        (r"\s*[-–]\s*", "-"),
-        (r"\s*—\s*", "-"),
-        (r"\s*to\s*", "-"),
-        
-        # Clean up spacing
-        (r"\s+", " "),  # Collapse multiple spaces
-        (r"\s*([:/-])\s*", r"\1"),  # Remove spaces around :/-
-        (r"[^\w\s\./:-]", ""),  # Remove unwanted characters but keep dots, slashes, colons, hyphens
-    ]
+    # Pattern 2: Test Name | Value | Reference Range | Unit
+    r"(?P<test_name>[a-zA-Z\s,]+?)\s+(?P<value>\d+[\.,]?\d*)\s+(?P<ref_range>\d+[\.,]?\d*\s*[-–]\s*\d+[\.,]?\d*)\s*(?P<unit>[a-zA-Z/%]+)?",
     
-    for pattern, repl in corrections:
-        text = re.sub(pattern, repl, text, flags=re.IGNORECASE)
+    # Pattern 3: Test Name | Value | Unit | Reference Range
+    r"(?P<test_name>[a-zA-Z\s,]+?)\s+(?P<value>\d+[\.,]?\d*)\s*(?P<unit>[a-zA-Z/%]+)\s+(?P<ref_range>\d+[\.,]?\d*\s*[-–]\s*\d+[\.,]?\d*)",
     
-    # Fix spacing around numbers and units
-    text = re.sub(r'(\d)\s+([a-zA-Z/%])', r'\1 \2', text)
-    text = re.sub(r'([a-zA-Z])\s+(\d)', r'\1 \2', text)
+    # Pattern 4: Simple Test Name | Value
+    r"(?P<test_name>[a-zA-Z\s,]+?)\s+(?P<value>\d+[\.,]?\d*)",
     
-    # Normalize reference range separators
-    text = re.sub(r'\s*[-–]\s*', '-', text)
+    # Pattern 5: Test Name with colon | Value | extras
+    r"(?P<test_name>[a-zA-Z\s,]+?):\s*(?P<value>\d+[\.,]?\d*)\s*(?P<unit>[a-zA-Z/%]+)?\s*(?P<ref_range>\d+[\.,]?\d*\s*[-–]\s*\d+[\.,]?\d*)?",
+]]
+
+def _lab_line_matches(text):
+    """Lazily yield the match of each lab-line pattern that finds one, in pattern order."""
+    match = _LAB_LINE_PATTERNS[0].search(text)
+    if match is None:
+        # Patterns 2-4 only match text that pattern 1 matches too (everything after its
+        # value is optional), so on a miss only the colon form can still find something
+        match = _LAB_LINE_PATTERNS[4].search(text)
+        if match:
+            yield match
+        return
     
-    return text.strip()
+    yield match
+    for pattern in _LAB_LINE_PATTERNS[1:]:
+        match = pattern.search(text)
+        if match:
+            yield match
 
 def parse_lab_test_line(text):
     """
@@ -171,31 +229,7 @@ def parse_lab_test_line(text):
     if not text or len(text.strip()) < 5:
         return None
     
-    # Enhanced comprehensive pattern for lab test results
-    # Handles various formats like:
-    # "MCHC 30.5* 31.5-34.5 gm/dl"
-    # "UREA 24.3 19-44 mg/dl"
-    # "SODIUM 138.1 135-145 mmol/l"
-    # "CREATININE, SERUM 0.91 0.7-1.3"
-    patterns = [
-        # Pattern 1: Test Name | Value | Flag | Reference Range | Unit
-        r"(?P<test_name>[a-zA-Z\s,]+?)\s+(?P<value>\d+[\.,]?\d*)\s*(?P<flag>[\*HLN])?\s*(?P<ref_range>\d+[\.,]?\d*\s*[-–]\s*\d+[\.,]?\d*)?\s*(?P<unit>[a-zA-Z/%]+)?",
-        
-        # Pattern 2: Test Name | Value | Reference Range | Unit
-        r"(?P<test_name>[a-zA-Z\s,]+?)\s+(?P<value>\d+[\.,]?\d*)\s+(?P<ref_range>\d+[\.,]?\d*\s*[-–]\s*\d+[\.,]?\d*)\s*(?P<unit>[a-zA-Z/%]+)?",
-        
-        # Pattern 3: Test Name | Value | Unit | Reference Range
-        r"(?P<test_name>[a-zA-Z\s,]+?)\s+(?P<value>\d+[\.,]?\d*)\s*(?P<unit>[a-zA-Z/%]+)\s+(?P<ref_range>\d+[\.,]?\d*\s*[-–]\s*\d+[\.,]?\d*)",
-        
-        # Pattern 4: Simple Test Name | Value
-        r"(?P<test_name>[a-zA-Z\s,]+?)\s+(?P<value>\d+[\.,]?\d*)",
-        
-        # Pattern 5: Test Name with colon | Value | extras
-        r"(?P<test_name>[a-zA-Z\s,]+?):\s*(?P<value>\d+[\.,]?\d*)\s*(?P<unit>[a-zA-Z/%]+)?\s*(?P<ref_range>\d+[\.,]?\d*\s*[-–]\s*\d+[\.,]?\d*)?",
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for match in _lab_line_matches(text):
         if match:
             test_name = match.group("test_name").strip() if match.group("test_name") else None
             value = match.group("value").replace(",", ".") if match.group("value") else None
@@ -223,6 +257,17 @@ def parse_lab_test_line(text):
     
     return None
 
+_HAS_LETTER_RE = re.compile(r'[a-zA-Z]')
+_INVALID_NAME_PATTERNS = [re.compile(pattern) for pattern in [
+    r'^\d+$',  # Only numbers
+    r'^[.\-\s]+$',  # Only punctuation
+    r'^(ul|ml|dl|l|mg|g|ng|pg|mcg|kg|lbs)$',  # Only units
+    r'^(a|an|the|and|or|of|in|on|at|to|for|with|by)$',  # Articles/prepositions
+    r'^(normal|abnormal|high|low|positive|negative)$',  # Result descriptors
+    r'^(page|report|lab|test|result|value|range|reference)$',  # Document terms
+    r'^(date|time|patient|doctor|physician|hospital|clinic)$',  # Header terms
+]]
+
 def is_valid_test_name(name: str) -> bool:
     """Enhanced validation for test names."""
     name = name.strip()
@@ -232,7 +277,7 @@ def is_valid_test_name(name: str) -> bool:
         return False
     
     # Must contain at least one letter
-    if not re.search(r'[a-zA-Z]', name):
+    if not _HAS_LETTER_RE.search(name):
         return False
     
     # Reject if all numbers/symbols
@@ -240,19 +285,9 @@ def is_valid_test_name(name: str) -> bool:
         return False
     
     # Reject common false positives
-    invalid_patterns = [
-        r'^\d+$',  # Only numbers
-        r'^[.\-\s]+$',  # Only punctuation
-        r'^(ul|ml|dl|l|mg|g|ng|pg|mcg|kg|lbs)$',  # Only units
-        r'^(a|an|the|and|or|of|in|on|at|to|for|with|by)$',  # Articles/prepositions
-        r'^(normal|abnormal|high|low|positive|negative)$',  # Result descriptors
-        r'^(page|report|lab|test|result|value|range|reference)$',  # Document terms
-        r'^(date|time|patient|doctor|physician|hospital|clinic)$',  # Header terms
-    ]
-    
     name_lower = name.lower()
-    for pattern in invalid_patterns:
-        if re.match(pattern, name_lower):
+    for pattern in _INVALID_NAME_PATTERNS:
+        if pattern.match(name_lower):
             return False
     
     # Reject very short common words
@@ -279,6 +314,21 @@ def extract_structured_lab_data(texts):
             results.append(parsed)
     return results
 
+RECOGNIZED_TESTS = [
+    'hemoglobin', 'hematocrit', 'rbc', 'wbc', 'platelet', 'mcv', 'mch', 'mchc',
+    'glucose', 'creatinine', 'urea', 'sodium', 'potassium', 'chloride', 'albumin',
+    'cholesterol', 'triglycerides', 'hdl', 'ldl', 'vldl',
+    'alt', 'ast', 'alp', 'bilirubin', 'ggt',
+    'tsh', 't3', 't4', 'ft3', 'ft4',
+    'troponin', 'ck-mb', 'bnp', 'nt-probnp',
+    'hba1c', 'fasting glucose', 'random glucose', 'insulin',
+    'esr', 'crp', 'procalcitonin',
+    'pt', 'ptt', 'inr', 'fibrinogen', 'd-dimer',
+    'protein', 'globulin', 'calcium', 'phosphorus', 'uric acid'
+]
+# One scan finds whether any recognized test name occurs as a substring
+_RECOGNIZED_TEST_RE = re.compile('|'.join(map(re.escape, RECOGNIZED_TESTS)))
+
 def calculate_confidence(parsed_data: Dict[str, Any]) -> float:
     """Calculate confidence score for extracted test result."""
     confidence = 0.0
@@ -297,83 +347,94 @@ def calculate_confidence(parsed_data: Dict[str, Any]) -> float:
     
     # Bonus for recognized test names
     test_name_lower = parsed_data.get('test_name', '').lower()
-    recognized_tests = [
-        'hemoglobin', 'hematocrit', 'rbc', 'wbc', 'platelet', 'mcv', 'mch', 'mchc',
-        'glucose', 'creatinine', 'urea', 'sodium', 'potassium', 'chloride', 'albumin',
-        'cholesterol', 'triglycerides', 'hdl', 'ldl', 'vldl',
-        'alt', 'ast', 'alp', 'bilirubin', 'ggt',
-        'tsh', 't3', 't4', 'ft3', 'ft4',
-        'troponin', 'ck-mb', 'bnp', 'nt-probnp',
-        'hba1c', 'fasting glucose', 'random glucose', 'insulin',
-        'esr', 'crp', 'procalcitonin',
-        'pt', 'ptt', 'inr', 'fibrinogen', 'd-dimer',
-        'protein', 'globulin', 'calcium', 'phosphorus', 'uric acid'
-    ]
-    
-    if any(test in test_name_lower for test in recognized_tests):
+    if _RECOGNIZED_TEST_RE.search(test_name_lower):
         confidence += 0.1
     
     return min(confidence, 1.0)
 
-def split_ocr_text_into_lines(text: str) -> List[str]:
-    """Split OCR text into meaningful lines while preserving test result integrity."""
+_UNIT_CHARS = frozenset(string.ascii_letters + '/%')
+
+def iter_ocr_text_lines(text: str) -> Iterator[str]:
+    """Yield meaningful lines from OCR text while preserving test result integrity.
+    
+    Lines are produced as they are completed, so a consumer such as
+    extract_structured_lab_data can clean and parse each one without the
+    whole list being built first.
+    """
     if not text:
-        return []
+        return
     
-    # First, split by newlines
-    lines = text.split('\n')
-    processed_lines = []
     current_line = ''
-    
-    for line in lines:
+    for line in text.split('\n'):
         line = line.strip()
         if not line:
             continue
             
         # Check if line looks like a complete test result
-        has_value = bool(re.search(r'\d+\.?\d*', line))
-        has_unit = bool(re.search(r'[a-zA-Z/%]+', line))
+        has_value = any(ch.isdecimal() for ch in line)
+        has_unit = not _UNIT_CHARS.isdisjoint(line)
         
         if has_value and has_unit:
             # This might be a complete test result
             if current_line:
-                processed_lines.append(current_line)
+                yield current_line
             current_line = line
         else:
             # This might be continuation of previous line
             current_line = (current_line + ' ' + line).strip()
     
     if current_line:
-        processed_lines.append(current_line)
-    
-    return processed_lines
+        yield current_line
+
+def split_ocr_text_into_lines(text: str) -> List[str]:
+    """Split OCR text into meaningful lines while preserving test result integrity."""
+    return list(iter_ocr_text_lines(text))
 
+# Fix common OCR errors in lab reports, applied as if in this order:
+#   0 -> O at end of words, then l -> 1, I -> 1, S -> 5 before numbers, then unit fixes.
+# They run as one alternation in a single pass, so each lookahead below already
+# accounts for what the earlier rules would have rewritten: a "digit" is one
+# the 0 -> O rule leaves alone, or an l/I that an earlier rule turns into 1, and
+# mlU/ml backs off when its trailing "ml" starts a mlU/L that runs first.
+_KEPT_DIGIT = r'(?!0(?:\s|$))\d'
+_DIGIT_AFTER_L = rf'(?:{_KEPT_DIGIT}|l{_KEPT_DIGIT})'
+_DIGIT_AFTER_I = rf'(?:{_DIGIT_AFTER_L}|I{_DIGIT_AFTER_L})'
+_OCR_REPLACEMENTS = [
+    (r'0(?=\s|$)', 'O'),                    # Fix zero to O at end of words
+    (rf'l(?={_KEPT_DIGIT})', '1'),          # Fix l to 1 before numbers
+    (rf'I(?={_DIGIT_AFTER_L})', '1'),       # Fix I to 1 before numbers
+    (rf'S(?={_DIGIT_AFTER_I})', '5'),       # Fix S to 5 before numbers
+    (r'mg/di', 'mg/dl'),                    # Fix common unit error
+    (r'g/di', 'g/dl'),                      # Fix common unit error
+    (r'mlU/L', 'mIU/L'),                    # Fix common unit error
+    (rf'mlU/ml(?!U/L|{_KEPT_DIGIT})', 'mIU/ml'),  # Fix common unit error (unless mlU/L or l -> 1 took its l)
+]
+_OCR_REPLACEMENT_RE = re.compile('|'.join(
+    f'(?P<g{i}>{pattern})' for i, (pattern, _) in enumerate(_OCR_REPLACEMENTS)
+))
+_OCR_REPLACEMENT_TABLE = {f'g{i}': replacement for i, (_, replacement) in enumerate(_OCR_REPLACEMENTS)}
+
+def _ocr_replacement(match):
+    return _OCR_REPLACEMENT_TABLE[match.lastgroup]
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_DIGIT_LETTER_RE = re.compile(r'(\d)([a-zA-Z])')
+_BRACKET_FLAG_RE = re.compile(r'\[([HL])\]')
+
+@functools.lru_cache(maxsize=1024)
 def clean_ocr_text(text: str) -> str:
     """Enhanced OCR text cleaning with focus on lab report formats."""
     if not text:
         return ""
     
     # Basic cleanup
-    text = re.sub(r'[\r\n]+', '\n', text)
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE_RE.sub(' ', text)
     
     # Fix common OCR errors in lab reports
-    replacements = {
-        r'0(?=\s|$)': 'O',  # Fix zero to O at end of words
-        r'l(?=\d)': '1',    # Fix l to 1 before numbers
-        r'I(?=\d)': '1',    # Fix I to 1 before numbers
-        r'S(?=\d)': '5',    # Fix S to 5 before numbers
-        r'g/di': 'g/dl',    # Fix common unit error
-        r'mg/di': 'mg/dl',  # Fix common unit error
-        r'mlU/L': 'mIU/L',  # Fix common unit error
-        r'mlU/ml': 'mIU/ml',# Fix common unit error
-    }
-    
-    for pattern, replacement in replacements.items():
-        text = re.sub(pattern, replacement, text)
+    text = _OCR_REPLACEMENT_RE.sub(_ocr_replacement, text)
     
     # Fix spacing around units
-    text = re.sub(r'(\d)([a-zA-Z])', r'\1 \2', text)  # Add space between number and unit
-    text = re.sub(r'\[([HL])\]', r' [\1]', text)      # Fix spacing around flags
+    text = _DIGIT_LETTER_RE.sub(r'\1 \2', text)  # Add space between number and unit
+    text = _BRACKET_FLAG_RE.sub(r' [\1]', text)   # Fix spacing around flags
     
     return text.strip()
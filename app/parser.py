@@ -1,10 +1,278 @@
+import functools
 import re
-from rapidfuzz import fuzz
+import sys
+from collections import deque
 import logging
 from typing import Tuple, Optional, List, Dict, Any
 from dataclasses import dataclass
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+# OCR noise cleanup: drop bracket/pipe noise and turn stray separators into spaces in one pass
+_OCR_NOISE_TABLE = str.maketrans({**dict.fromkeys('|}«»{}()[]'), ':': ' ', ';': ' '})
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Medical-specific OCR corrections. Each group of rules runs as one alternation in a
+# single pass that gives the same result as applying its rules one after another.
+def _compile_corrections(first_chars, rules):
+    """Fuse (pattern, replacement) rules into one case-insensitive regex and its replacement callback.
+    
+    first_chars is a lookahead every rule starts with, so positions that cannot
+    start any rule are skipped without trying each alternative in turn.
+    """
+    regex = re.compile(f'(?={first_chars})(?:' + '|'.join(
+        f'(?P<g{i}>{pattern})' for i, (pattern, _) in enumerate(rules)
+    ) + ')', re.IGNORECASE)
+    table = {f'g{i}': replacement for i, (_, replacement) in enumerate(rules)}
+    return regex, lambda match: table[match.lastgroup]
+
+# Common character misreads, applied as if in this order. Each lookahead already
+# accounts for what the earlier rules would have rewritten: a "digit" is one the
+# 0 -> O rule leaves alone, or an S/I that an earlier rule turns into a digit.
+_KEPT_DIGIT = r'(?!0(?:\s|$))\d'
+_DIGIT_AFTER_I = rf'(?:{_KEPT_DIGIT}|S(?=\s|{_KEPT_DIGIT}))'
+_DIGIT_AFTER_L = rf'(?:{_DIGIT_AFTER_I}|I(?=\s|{_DIGIT_AFTER_I}))'
+_OCR_CHARACTER_RE, _ocr_character_fix = _compile_corrections(r'[0silo]', [
+    (r'(?<!\d)0(?=\s|$)', 'O'),                    # 0 to O at word boundaries
+    (rf'(?<!\d)S(?=\s|{_KEPT_DIGIT})', '5'),       # S to 5 before digits
+    (rf'(?<!\d)I(?=\s|{_DIGIT_AFTER_I})', '1'),    # I to 1 before digits
+    (rf'(?<!\d)l(?=\s|{_DIGIT_AFTER_L})', '1'),    # l to 1 before digits
+    (r'(?<=\d)O(?=\s|$)', '0'),                    # O (or o) to 0 after digits
+])
+
+# Medical term and unit corrections
+_OCR_TERM_RE, _ocr_term_fix = _compile_corrections(r'\b[hrwmgintpc]', [
+    (r'\bHaemoglobin\b', 'Hemoglobin'),
+    (r'\bHaematocrit\b', 'Hematocrit'),
+    (r'\bR\.B\.C\b', 'RBC'),
+    (r'\bW\.B\.C\b', 'WBC'),
+    (r'\bmillcmm\b', 'mill/cmm'),
+    (r'\bmicro\s*gram\s+ml\b', 'mcg/ml'),  # mcg followed by ml, which the unit fix below joins
+    (r'\bmicro\s*gram\b', 'mcg'),
+    (r'\bmicro\s*liter\b', 'mcl'),
+    (r'\bmg\s*%\s*dl\b', 'mg/dl'),
+    (r'\bg\s*%\s*dl\b', 'g/dl'),
+    (r'\bmmol\s*l\b', 'mmol/l'),
+    (r'\biu\s*ml\b', 'iu/ml'),
+    (r'\bng\s*ml\b', 'ng/ml'),
+    (r'\bpg\s*ml\b', 'pg/ml'),
+    (r'\bmcg\s*ml\b', 'mcg/ml'),
+    (r'\bcells\s*ul\b', 'cells/ul'),
+    (r'\bthousand\s*ul\b', 'thousand/ul'),
+    (r'\bmillion\s*ul\b', 'million/ul'),
+])
+
+# Range separators
+_RANGE_SEPARATOR_RE = re.compile(r'\s*(?:-|–|—|to)\s*', re.IGNORECASE)
+
+# Spacing around numbers and units
+_DIGIT_SPACE_UNIT_RE = re.compile(r'(\d)\s+([a-zA-Z/%])')
+_LETTER_SPACE_DIGIT_RE = re.compile(r'([a-zA-Z])\s+(\d)')
+
+# Common test result patterns in lab reports
+_TEST_LINE_PATTERNS = [re.compile(pattern) for pattern in [
+    # Standard format: Test Name | Value [Flag] Unit | Range
+    r'([A-Za-z][\w\s\-\(\)\/,.]+?)\s+([\d\.]+)\s*\[?([HLhl\*]?)\]?\s*([\w/%\.]+)?\s*([\d\.-]+\s*-\s*[\d\.]+)?',
+    
+    # Format with range at end: Test Name | Value Unit | Range
+    r'([A-Za-z][\w\s\-\(\)\/,.]+?)\s+([\d\.]+)\s*([\w/%\.]+)?\s+([\d\.-]+\s*-\s*[\d\.]+)',
+    
+    # Format with flag after value: Test Name | Value Flag Unit
+    r'([A-Za-z][\w\s\-\(\)\/,.]+?)\s+([\d\.]+)\s*([HLhl\*])\s*([\w/%\.]+)',
+    
+    # Simple format: Test Name | Value Unit
+    r'([A-Za-z][\w\s\-\(\)\/,.]+?)\s+([\d\.]+)\s*([\w/%\.]+)',
+]]
+
+def _test_line_matches(line):
+    """Lazily yield the match of each test line pattern that matches, in pattern order."""
+    match = _TEST_LINE_PATTERNS[0].match(line)
+    if match is None:
+        # Every later pattern starts with the first one's name and value, and everything
+        # after its value is optional, so none of them can match either
+        return
+    
+    yield match
+    for pattern in _TEST_LINE_PATTERNS[1:]:
+        match = pattern.match(line)
+        if match:
+            yield match
+
+# Units seen on lab reports
+_COMMON_UNITS = frozenset({
+    'mg/dl', 'g/dl', 'mmol/l', 'iu/ml', 'ng/ml', 'pg/ml', 'mcg/ml',
+    'fl', 'pg', 'fmol/l', 'pmol/l', 'cells/ul', 'cells/mm3',
+    'thousand/ul', 'million/ul', '%', 'ratio', 'index', 'score',
+    'bpm', 'mmhg', 'cm', 'kg', 'lbs', 'celsius', 'fahrenheit',
+    'copies/ml', 'log copies/ml', 'mu/ml', 'u/ml', 'ku/l', 'u/l',
+    'mill/cmm', 'mill/cu.mm', '/ul', 'mg/l', 'gm/dl',
+    'iul', 'lu1', 'lul', '/l', 'mil/cumm', 'mill/cumm',
+    'gldl', 'g/l', 'ng/dl', 'pg/dl', '/mm3', '/cumm'
+})
+
+# Test names by category
+_TEST_CATEGORIES = {
+    'hematology': (
+        'hemoglobin', 'hb', 'hematocrit', 'hct', 'rbc', 'wbc',
+        'platelet', 'plt', 'mcv', 'mch', 'mchc', 'rdw',
+        'neutrophil', 'lymphocyte', 'monocyte', 'eosinophil',
+        'basophil', 'mpv', 'complete blood count', 'cbc'
+    ),
+    'chemistry': (
+        'glucose', 'creatinine', 'urea', 'bun', 'sodium', 'na',
+        'potassium', 'k', 'chloride', 'cl', 'calcium', 'ca',
+        'phosphorus', 'magnesium', 'albumin', 'total protein',
+        'globulin', 'a/g ratio'
+    ),
+    'lipid': (
+        'cholesterol', 'triglycerides', 'hdl', 'ldl', 'vldl',
+        'total lipids', 'lipid profile'
+    ),
+    'liver': (
+        'alt', 'ast', 'alp', 'ggt', 'bilirubin', 'total bilirubin',
+        'direct bilirubin', 'indirect bilirubin', 'sgpt', 'sgot'
+    ),
+    'thyroid': (
+        'tsh', 't3', 't4', 'ft3', 'ft4', 'thyroid',
+        'thyroid stimulating hormone'
+    ),
+    'cardiac': (
+        'troponin', 'ck-mb', 'ck', 'cpk', 'ldh', 'bnp',
+        'nt-probnp', 'cardiac'
+    ),
+    'diabetes': (
+        'hba1c', 'glucose', 'blood sugar', 'fbs', 'ppbs',
+        'random blood sugar', 'insulin'
+    ),
+    'inflammatory': (
+        'esr', 'crp', 'procalcitonin', 'sed rate',
+        'erythrocyte sedimentation rate'
+    ),
+    'coagulation': (
+        'pt', 'ptt', 'inr', 'fibrinogen', 'd-dimer', 'bleeding time',
+        'clotting time', 'aptt'
+    ),
+}
+
+# Unit variations standardized on matched test lines
+_LINE_UNIT_REPLACEMENTS = {
+    'gm/dl': 'g/dl',
+    'mill/cmm': 'million/cmm',
+    'mill/cu.mm': 'million/cmm',
+    'iul': '/ul',
+    'lu1': '/ul',
+    'ul': '/ul',
+}
+
+# Test name cleanup
+_NAME_PREFIX_RE = re.compile(r'^(test|result|level)[\s:]+', re.IGNORECASE)
+_TRAILING_COLON_SPACE_RE = re.compile(r'[\s:]+$')
+_TAL_SUFFIX_RE = re.compile(r'[-\s]+ta[l1]$')
+_HASH_ARTIFACT_RE = re.compile(r'\{#\}')
+_TRAILING_PARENS_RE = re.compile(r'\([^)]*\)$')
+_TRAILING_PARENTHETICAL_RE = re.compile(r'\s*\([^)]*\)\s*$')
+_TRAILING_HASH_RE = re.compile(r'\s*#\s*$')
+_TOTAL_COUNT_RE = re.compile(r'^total\s+.*\s+count$')
+
+# Common test names that pin a category regardless of the per-category match, checked in order
+_CATEGORY_OVERRIDES = [(category, re.compile('|'.join(map(re.escape, terms)))) for category, terms in [
+    ('hematology', ['blood count', 'cbc', 'complete blood']),
+    ('chemistry', ['kidney', 'renal', 'kft']),
+    ('liver', ['liver', 'hepatic', 'lft']),
+    ('thyroid', ['thyroid', 'tsh', 't3', 't4']),
+    ('lipid', ['lipid', 'cholesterol', 'triglyceride']),
+    ('diabetes', ['sugar', 'glucose', 'hba1c']),
+]]
+_ANY_CATEGORY_OVERRIDE_RE = re.compile('|'.join(terms_re.pattern for _, terms_re in _CATEGORY_OVERRIDES))
+
+# Flag determination
+_NON_NUMERIC_RE = re.compile(r'[^\d.]')
+_RANGE_BOUNDS_RE = re.compile(r'([<>≤≥]?\d+\.?\d*)\s*[-–]\s*([<>≤≥]?\d+\.?\d*)')
+_COMPARISON_OPERATORS = '<>≤≥'
+
+# Tabular document parsing
+_DOCUMENT_TEST_NAME_RE = re.compile(r'^(.*?(?:Count|Volume|Width|Hb|Distribution|Haemoglobin|Haematocrit|Neutrophils|Lymphocytes|Eosinophils|Monocytes|Basophils|Platelets|MPV|FRACTION).*?)(?:\s+(\d+\.?\d*)(?:\s*\[([HLhl\*])\])?\s*([\w/%\.]+))?$')
+_DOCUMENT_VALUE_LINE_RE = re.compile(r'^\s*[\d\.]+\s*\[?[HLhl\*]?\]?\s*[\w/%\.]+\s*(?:[\d\.-]+\s*-\s*[\d\.]+)?')
+_BRACKETED_FLAG_RE = re.compile(r'\[[HLhl\*]\]')
+_DOCUMENT_RANGE_LINE_RE = re.compile(r'^\s*[\d\.-]+\s*-\s*[\d\.]+\s*[\w/%\.]+')
+_VALUE_WITH_UNIT_RE = re.compile(r'\d+\.?\d*\s*[a-zA-Z/%]+')
+
+# Handle common variations and abbreviations
+_NAME_REPLACEMENTS = {
+    'hb': 'Hemoglobin',
+    'haemoglobin': 'Hemoglobin',
+    'wbc': 'White Blood Cell',
+    'rbc': 'Red Blood Cell',
+    'r.b.c.': 'Red Blood Cell',
+    'w.b.c.': 'White Blood Cell',
+    'plt': 'Platelet',
+    'mcv': 'Mean Corpuscular Volume',
+    'mc.v': 'Mean Corpuscular Volume',
+    'mch': 'Mean Corpuscular Hemoglobin',
+    'mc.h': 'Mean Corpuscular Hemoglobin',
+    'mchc': 'Mean Corpuscular Hemoglobin Concentration',
+    'mc.h.c': 'Mean Corpuscular Hemoglobin Concentration',
+    'rdw': 'Red Cell Distribution Width',
+    'r.d.w': 'Red Cell Distribution Width',
+    'mpv': 'Mean Platelet Volume',
+    'hct': 'Hematocrit',
+    'haematocrit': 'Hematocrit',
+    'pcv': 'Hematocrit',
+    'neut': 'Neutrophils',
+    'lymph': 'Lymphocytes',
+    'mono': 'Monocytes',
+    'eos': 'Eosinophils',
+    'baso': 'Basophils',
+    'differential count': 'Differential Count',
+    'absolute count': 'Absolute Count'
+}
+_NAME_PARTIAL_MATCHES = [
+    (re.compile(rf'\b{re.escape(abbr)}\b'), full) for abbr, full in _NAME_REPLACEMENTS.items()
+]
+
+# Test name validation
+_HAS_LETTER_RE = re.compile(r'[a-zA-Z]')
+# Common false positives, matched as one anchored alternation
+_INVALID_NAME_RE = re.compile('^(?:' + '|'.join([
+    r'\d+',  # Only numbers
+    r'[.\-\s]+',  # Only punctuation
+    r'(ul|ml|dl|l|mg|g|ng|pg|mcg|kg|lbs)',  # Only units
+    r'(a|an|the|and|or|of|in|on|at|to|for|with|by)',  # Articles/prepositions
+    r'(normal|abnormal|high|low|positive|negative)',  # Result descriptors
+    r'(page|report|lab|test|result|value|range|reference)',  # Document terms
+    r'(date|time|patient|doctor|physician|hospital|clinic)',  # Header terms
+]) + ')$')
+_SHORT_COMMON_WORDS = frozenset({
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was', 'one',
+    'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'man', 'new', 'now', 'old', 'see',
+    'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too', 'use'
+})
+
+def _clean_ocr_text(text: str) -> str:
+    """Apply OCR noise removal and medical-specific corrections to non-empty text."""
+    # Remove common OCR noise; separator runs become space runs that the whitespace pass collapses
+    text = text.translate(_OCR_NOISE_TABLE)
+    text = _WHITESPACE_RE.sub(' ', text)
+    
+    # Medical-specific OCR corrections
+    text = _OCR_CHARACTER_RE.sub(_ocr_character_fix, text)
+    text = _OCR_TERM_RE.sub(_ocr_term_fix, text)
+    text = _RANGE_SEPARATOR_RE.sub('-', text)
+    
+    # Fix spacing around numbers and units
+    text = _DIGIT_SPACE_UNIT_RE.sub(r'\1 \2', text)
+    text = _LETTER_SPACE_DIGIT_RE.sub(r'\1 \2', text)
+    
+    return text.strip()
+
+# Memoized variant for line-sized inputs
+CLEAN_TEXT_CACHE_MAX_LEN = 2048
+_clean_ocr_text_cached = functools.lru_cache(maxsize=4096)(_clean_ocr_text)
+
+# slots=True needs Python 3.10+; on 3.9 TestResult stays a regular dataclass
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_OPTIONS)
 class TestResult:
     """Structured representation of a lab test result."""
     test_name: str
@@ -18,19 +286,11 @@ class TestResult:
 class MedicalDocumentParser:
     """Enhanced parser for various types of medical documents."""
     
+    # Read-only lookup tables shared by every instance
+    common_units = _COMMON_UNITS
+    test_categories = _TEST_CATEGORIES
+    
     def __init__(self):
-        self.common_units = {
-            'mg/dl', 'g/dl', 'mmol/l', 'iu/ml', 'ng/ml', 'pg/ml', 'mcg/ml',
-            'fl', 'pg', 'fmol/l', 'pmol/l', 'cells/ul', 'cells/mm3',
-            'thousand/ul', 'million/ul', '%', 'ratio', 'index', 'score',
-            'bpm', 'mmhg', 'cm', 'kg', 'lbs', 'celsius', 'fahrenheit',
-            'copies/ml', 'log copies/ml', 'mu/ml', 'u/ml', 'ku/l', 'u/l',
-            'mill/cmm', 'mill/cu.mm', '/ul', 'g/dl', 'mg/l', 'gm/dl',
-            'iul', 'lu1', 'lul', '/l', 'mil/cumm', 'mill/cumm',
-            'gldl', 'g/l', 'mg/dl', 'ng/dl', 'pg/dl',
-            'fl', 'pg', 'g/dl', '/ul', '/mm3', '/cumm'
-        }
-        
         # Unit standardization map
         self.unit_standardization = {
             'gm/dl': 'g/dl',
@@ -47,49 +307,6 @@ class MedicalDocumentParser:
             '/cumm': '/mm3'
         }
         
-        self.test_categories = {
-            'hematology': [
-                'hemoglobin', 'hb', 'hematocrit', 'hct', 'rbc', 'wbc', 
-                'platelet', 'plt', 'mcv', 'mch', 'mchc', 'rdw', 
-                'neutrophil', 'lymphocyte', 'monocyte', 'eosinophil', 
-                'basophil', 'mpv', 'complete blood count', 'cbc'
-            ],
-            'chemistry': [
-                'glucose', 'creatinine', 'urea', 'bun', 'sodium', 'na', 
-                'potassium', 'k', 'chloride', 'cl', 'calcium', 'ca',
-                'phosphorus', 'magnesium', 'albumin', 'total protein',
-                'globulin', 'a/g ratio'
-            ],
-            'lipid': [
-                'cholesterol', 'triglycerides', 'hdl', 'ldl', 'vldl',
-                'total lipids', 'lipid profile'
-            ],
-            'liver': [
-                'alt', 'ast', 'alp', 'ggt', 'bilirubin', 'total bilirubin',
-                'direct bilirubin', 'indirect bilirubin', 'sgpt', 'sgot'
-            ],
-            'thyroid': [
-                'tsh', 't3', 't4', 'ft3', 'ft4', 'thyroid', 
-                'thyroid stimulating hormone'
-            ],
-            'cardiac': [
-                'troponin', 'ck-mb', 'ck', 'cpk', 'ldh', 'bnp', 
-                'nt-probnp', 'cardiac'
-            ],
-            'diabetes': [
-                'hba1c', 'glucose', 'blood sugar', 'fbs', 'ppbs', 
-                'random blood sugar', 'insulin'
-            ],
-            'inflammatory': [
-                'esr', 'crp', 'procalcitonin', 'sed rate', 
-                'erythrocyte sedimentation rate'
-            ],
-            'coagulation': [
-                'pt', 'ptt', 'inr', 'fibrinogen', 'd-dimer', 'bleeding time',
-                'clotting time', 'aptt'
-            ]
-        }
-
         # Add more test patterns
         self.test_patterns = [
             'COMPLETE BLOOD COUNT', 'CBC',
@@ -122,63 +339,32 @@ class MedicalDocumentParser:
             'GLOBULIN', 'GLOB'
         ]
         
+        # Single alternation over every category's names, for the recognized-test bonus
+        self.recognized_test_re = re.compile('|'.join(
+            re.escape(test) for tests in self.test_categories.values() for test in tests
+        ))
+        
+        # Single lowercase alternation over test_patterns, for section-prefix checks
+        self.test_pattern_re = re.compile('|'.join(
+            re.escape(pattern.lower()) for pattern in self.test_patterns
+        ))
+        
+        # One alternation per category, checked in category order when grouping results
+        self.category_res = [
+            (cat, re.compile('|'.join(re.escape(test.lower()) for test in tests)))
+            for cat, tests in self.test_categories.items()
+        ]
+        
     def clean_ocr_text(self, text: str) -> str:
         """Enhanced OCR error correction with medical-specific rules."""
-        logging.info(f"[RAW OCR] {text}")
+        logger.debug("[RAW OCR] %s", text)
         if not text:
             return ""
         
-        # Remove common OCR noise
-        text = re.sub(r'[|}«»{}()\[\]]+', '', text)
-        text = re.sub(r'[|:;]+', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Medical-specific OCR corrections
-        ocr_corrections = {
-            # Common character misreads
-            r'(?<!\d)0(?=\s|$)': 'O',  # 0 to O at word boundaries
-            r'(?<!\d)S(?=\s|\d)': '5',  # S to 5 before digits
-            r'(?<!\d)I(?=\s|\d)': '1',  # I to 1 before digits
-            r'(?<!\d)l(?=\s|\d)': '1',  # l to 1 before digits
-            r'(?<=\d)O(?=\s|$)': '0',   # O to 0 after digits
-            r'(?<=\d)o(?=\s|$)': '0',   # o to 0 after digits
-            
-            # Medical term corrections
-            r'\bHaemoglobin\b': 'Hemoglobin',
-            r'\bHaematocrit\b': 'Hematocrit',
-            r'\bR\.B\.C\b': 'RBC',
-            r'\bW\.B\.C\b': 'WBC',
-            r'\bmillcmm\b': 'mill/cmm',
-            r'\bmicro\s*gram\b': 'mcg',
-            r'\bmicro\s*liter\b': 'mcl',
-            
-            # Unit corrections
-            r'\bmg\s*%\s*dl\b': 'mg/dl',
-            r'\bg\s*%\s*dl\b': 'g/dl',
-            r'\bmmol\s*l\b': 'mmol/l',
-            r'\biu\s*ml\b': 'iu/ml',
-            r'\bng\s*ml\b': 'ng/ml',
-            r'\bpg\s*ml\b': 'pg/ml',
-            r'\bmcg\s*ml\b': 'mcg/ml',
-            r'\bcells\s*ul\b': 'cells/ul',
-            r'\bthousand\s*ul\b': 'thousand/ul',
-            r'\bmillion\s*ul\b': 'million/ul',
-            
-            # Range separators
-            r'\s*-\s*': '-',
-            r'\s*–\s*': '-',
-            r'\s*—\s*': '-',
-            r'\s*to\s*': '-',
-        }
-        
-        for pattern, replacement in ocr_corrections.items():
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-        
-        # Fix spacing around numbers and units
-        text = re.sub(r'(\d)\s+([a-zA-Z/%])', r'\1 \2', text)
-        text = re.sub(r'([a-zA-Z])\s+(\d)', r'\1 \2', text)
-        
-        return text.strip()
+        # Lines repeat across sections and pages; whole documents are too big to keep around
+        if len(text) <= CLEAN_TEXT_CACHE_MAX_LEN:
+            return _clean_ocr_text_cached(text)
+        return _clean_ocr_text(text)
 
     def extract_test_data_from_line(self, line: str) -> Optional[TestResult]:
         """Enhanced pattern matching for various medical test formats."""
@@ -187,71 +373,47 @@ class MedicalDocumentParser:
         if not line or len(line) < 5:
             return None
 
-        # Common test result patterns in lab reports
-        patterns = [
-            # Standard format: Test Name | Value [Flag] Unit | Range
-            r'([A-Za-z][\w\s\-\(\)\/,.]+?)\s+([\d\.]+)\s*\[?([HLhl\*]?)\]?\s*([\w/%\.]+)?\s*([\d\.-]+\s*-\s*[\d\.]+)?',
+        for match in _test_line_matches(line):
+            groups = match.groups()
+            test_name = self.clean_test_name(groups[0])
             
-            # Format with range at end: Test Name | Value Unit | Range
-            r'([A-Za-z][\w\s\-\(\)\/,.]+?)\s+([\d\.]+)\s*([\w/%\.]+)?\s+([\d\.-]+\s*-\s*[\d\.]+)',
+            # Extract core components
+            value = groups[1]
             
-            # Format with flag after value: Test Name | Value Flag Unit
-            r'([A-Za-z][\w\s\-\(\)\/,.]+?)\s+([\d\.]+)\s*([HLhl\*])\s*([\w/%\.]+)',
+            # Handle different pattern formats
+            if len(groups) >= 4:
+                flag = groups[2] if groups[2] in 'HLhl*' else ''
+                unit = groups[2] if not flag else groups[3]
+                ref_range = groups[4] if len(groups) > 4 else None
+            else:
+                flag = ''
+                unit = groups[2] if len(groups) > 2 else None
+                ref_range = None
             
-            # Simple format: Test Name | Value Unit
-            r'([A-Za-z][\w\s\-\(\)\/,.]+?)\s+([\d\.]+)\s*([\w/%\.]+)',
-        ]
-
-        for pattern in patterns:
-            match = re.match(pattern, line)
-            if match:
-                groups = match.groups()
-                test_name = self.clean_test_name(groups[0])
-                
-                # Extract core components
-                value = groups[1]
-                
-                # Handle different pattern formats
-                if len(groups) >= 4:
-                    flag = groups[2] if groups[2] in 'HLhl*' else ''
-                    unit = groups[2] if not flag else groups[3]
-                    ref_range = groups[4] if len(groups) > 4 else None
-                else:
-                    flag = ''
-                    unit = groups[2] if len(groups) > 2 else None
-                    ref_range = None
-                
-                # Clean up unit
-                if unit:
-                    unit = unit.strip().lower()
-                    # Standardize common unit variations
-                    unit_replacements = {
-                        'gm/dl': 'g/dl',
-                        'gm/dl': 'g/dl',
-                        'mill/cmm': 'million/cmm',
-                        'mill/cu.mm': 'million/cmm',
-                        'iul': '/ul',
-                        'lu1': '/ul',
-                        'ul': '/ul',
-                    }
-                    unit = unit_replacements.get(unit, unit)
-                
-                # Calculate confidence
-                confidence = self.calculate_confidence(test_name, value, unit, ref_range, flag)
-                
-                if self.is_valid_test_name(test_name):
-                    return TestResult(
-                        test_name=test_name,
-                        value=value,
-                        unit=unit,
-                        reference_range=ref_range,
-                        flag=flag,
-                        confidence=confidence,
-                        raw_text=line
-                    )
+            # Clean up unit
+            if unit:
+                unit = unit.strip().lower()
+                # Standardize common unit variations
+                unit = _LINE_UNIT_REPLACEMENTS.get(unit, unit)
+            
+            # Calculate confidence
+            confidence = self.calculate_confidence(test_name, value, unit, ref_range, flag)
+            
+            if self.is_valid_test_name(test_name):
+                return TestResult(
+                    test_name=test_name,
+                    value=value,
+                    unit=unit,
+                    reference_range=ref_range,
+                    flag=flag,
+                    confidence=confidence,
+                    raw_text=line
+                )
         return None
 
-    def clean_test_name(self, name: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def clean_test_name(name: str) -> str:
         """Clean and normalize test names."""
         if not name:
             return name
@@ -259,66 +421,36 @@ class MedicalDocumentParser:
         name = name.strip()
         
         # Remove common prefixes/suffixes
-        name = re.sub(r'^(test|result|level)[\s:]+', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'[\s:]+$', '', name)
+        name = _NAME_PREFIX_RE.sub('', name)
+        name = _TRAILING_COLON_SPACE_RE.sub('', name)
         
         # Clean up common OCR errors
         name = name.replace('1', 'l')  # Replace mistaken 1's with l's
-        name = re.sub(r'[-\s]+ta[l1]$', '', name)  # Remove -tal suffix from OCR errors
+        name = _TAL_SUFFIX_RE.sub('', name)  # Remove -tal suffix from OCR errors
         
         # Remove artifacts
-        name = re.sub(r'\{#\}', '', name)  # Remove {#}
-        name = re.sub(r'\([^)]*\)$', '', name)  # Remove trailing parentheses
-        name = re.sub(r'[\s:]+$', '', name)  # Remove trailing colons and spaces
-        
-        # Handle common variations and abbreviations
-        replacements = {
-            'hb': 'Hemoglobin',
-            'haemoglobin': 'Hemoglobin',
-            'wbc': 'White Blood Cell',
-            'rbc': 'Red Blood Cell',
-            'r.b.c.': 'Red Blood Cell',
-            'w.b.c.': 'White Blood Cell',
-            'plt': 'Platelet',
-            'mcv': 'Mean Corpuscular Volume',
-            'mc.v': 'Mean Corpuscular Volume',
-            'mch': 'Mean Corpuscular Hemoglobin',
-            'mc.h': 'Mean Corpuscular Hemoglobin',
-            'mchc': 'Mean Corpuscular Hemoglobin Concentration',
-            'mc.h.c': 'Mean Corpuscular Hemoglobin Concentration',
-            'rdw': 'Red Cell Distribution Width',
-            'r.d.w': 'Red Cell Distribution Width',
-            'mpv': 'Mean Platelet Volume',
-            'hct': 'Hematocrit',
-            'haematocrit': 'Hematocrit',
-            'pcv': 'Hematocrit',
-            'neut': 'Neutrophils',
-            'lymph': 'Lymphocytes',
-            'mono': 'Monocytes',
-            'eos': 'Eosinophils',
-            'baso': 'Basophils',
-            'differential count': 'Differential Count',
-            'absolute count': 'Absolute Count'
-        }
+        name = _HASH_ARTIFACT_RE.sub('', name)  # Remove {#}
+        name = _TRAILING_PARENS_RE.sub('', name)  # Remove trailing parentheses
+        name = _TRAILING_COLON_SPACE_RE.sub('', name)  # Remove trailing colons and spaces
         
         # Try exact match first
         name_lower = name.lower()
-        if name_lower in replacements:
-            return replacements[name_lower]
+        if name_lower in _NAME_REPLACEMENTS:
+            return _NAME_REPLACEMENTS[name_lower]
             
         # Try partial matches
-        for abbr, full in replacements.items():
-            if re.search(rf'\b{re.escape(abbr)}\b', name_lower):
+        for abbr_pattern, full in _NAME_PARTIAL_MATCHES:
+            if abbr_pattern.search(name_lower):
                 return full
         
         # Clean up the name
-        name = re.sub(r'\s*\([^)]*\)\s*$', '', name)  # Remove parenthetical at end
-        name = re.sub(r'\s*#\s*$', '', name)  # Remove trailing #
-        name = re.sub(r'\s+', ' ', name)  # Normalize spaces
+        name = _TRAILING_PARENTHETICAL_RE.sub('', name)  # Remove parenthetical at end
+        name = _TRAILING_HASH_RE.sub('', name)  # Remove trailing #
+        name = _WHITESPACE_RE.sub(' ', name)  # Normalize spaces
         name = name.strip()
         
         # Special case for "Total X Count"
-        if re.match(r'^total\s+.*\s+count$', name_lower):
+        if _TOTAL_COUNT_RE.match(name_lower):
             return name.title()
         
         return name
@@ -334,15 +466,18 @@ class MedicalDocumentParser:
             elif value.startswith('<') or value.startswith('≤'):
                 return "L"
 
-            # Parse numeric value
-            val_num = float(re.sub(r'[^\d.]', '', value))
-
             # Parse reference range
-            range_match = re.match(r'([<>≤≥]?\d+\.?\d*)\s*[-–]\s*([<>≤≥]?\d+\.?\d*)', ref_range)
+            range_match = _RANGE_BOUNDS_RE.match(ref_range)
             if range_match:
+                # Bounds are digits with at most a leading operator, so no regex strip is needed
                 low_str, high_str = range_match.groups()
-                low = float(re.sub(r'[^\d.]', '', low_str))
-                high = float(re.sub(r'[^\d.]', '', high_str))
+                low = float(low_str.lstrip(_COMPARISON_OPERATORS))
+                high = float(high_str.lstrip(_COMPARISON_OPERATORS))
+                # Plain decimal values parse directly; anything else is scrubbed down to digits and dots
+                if value.replace('.', '', 1).isdecimal():
+                    val_num = float(value)
+                else:
+                    val_num = float(_NON_NUMERIC_RE.sub('', value))
 
                 if val_num > high:
                     return "H"
@@ -371,15 +506,14 @@ class MedicalDocumentParser:
             confidence += 0.1
         
         # Bonus for recognized test names
-        test_name_lower = test_name.lower()
-        for category, tests in self.test_categories.items():
-            if any(test in test_name_lower for test in tests):
-                confidence += 0.1
-                break
+        if self.recognized_test_re.search(test_name.lower()):
+            confidence += 0.1
         
         return min(confidence, 1.0)
 
-    def is_valid_test_name(self, name: str) -> bool:
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def is_valid_test_name(name: str) -> bool:
         """Enhanced validation for test names."""
         name = name.strip()
         
@@ -387,32 +521,17 @@ class MedicalDocumentParser:
         if not name or len(name) < 2:
             return False
         
-        # Must contain at least one letter
-        if not re.search(r'[a-zA-Z]', name):
-            return False
-        
-        # Reject if all numbers/symbols
-        if all(char in '0123456789.- /' for char in name):
+        # Must contain at least one letter (which also rules out names made only of numbers/symbols)
+        if not _HAS_LETTER_RE.search(name):
             return False
         
         # Reject common false positives
-        invalid_patterns = [
-            r'^\d+$',  # Only numbers
-            r'^[.\-\s]+$',  # Only punctuation
-            r'^(ul|ml|dl|l|mg|g|ng|pg|mcg|kg|lbs)$',  # Only units
-            r'^(a|an|the|and|or|of|in|on|at|to|for|with|by)$',  # Articles/prepositions
-            r'^(normal|abnormal|high|low|positive|negative)$',  # Result descriptors
-            r'^(page|report|lab|test|result|value|range|reference)$',  # Document terms
-            r'^(date|time|patient|doctor|physician|hospital|clinic)$',  # Header terms
-        ]
-        
         name_lower = name.lower()
-        for pattern in invalid_patterns:
-            if re.match(pattern, name_lower):
-                return False
+        if _INVALID_NAME_RE.match(name_lower):
+            return False
         
         # Reject very short common words
-        if len(name) <= 3 and name_lower in {'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'man', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too', 'use'}:
+        if len(name) <= 3 and name_lower in _SHORT_COMMON_WORDS:
             return False
         
         return True
@@ -429,12 +548,8 @@ class MedicalDocumentParser:
         lines = text.split('\n')
         results = []
         
-        # Variables to track test information
-        test_names = []
-        test_values = []
-        test_units = []
-        test_flags = []
-        test_ranges = []
+        # Variables to track test information; names wait here in order until a value line arrives
+        test_names = deque()
         in_test_section = False
         current_section = ""
         
@@ -444,14 +559,15 @@ class MedicalDocumentParser:
                 continue
             
             # Detect section headers
-            if 'COMPLETE BLOOD COUNT' in line.upper():
+            line_upper = line.upper()
+            if 'COMPLETE BLOOD COUNT' in line_upper:
                 in_test_section = True
                 current_section = 'COMPLETE BLOOD COUNT'
                 continue
-            elif 'DIFFERENTIAL' in line.upper() and 'COUNT' in line.upper():
+            elif 'DIFFERENTIAL' in line_upper and 'COUNT' in line_upper:
                 current_section = 'DIFFERENTIAL COUNT'
                 continue
-            elif 'ABSOLUTE' in line.upper() and 'COUNT' in line.upper():
+            elif 'ABSOLUTE' in line_upper and 'COUNT' in line_upper:
                 current_section = 'ABSOLUTE COUNT'
                 continue
             
@@ -459,7 +575,7 @@ class MedicalDocumentParser:
                 continue
             
             # Check if line contains a test name
-            test_name_match = re.match(r'^(.*?(?:Count|Volume|Width|Hb|Distribution|Haemoglobin|Haematocrit|Neutrophils|Lymphocytes|Eosinophils|Monocytes|Basophils|Platelets|MPV|FRACTION).*?)(?:\s+(\d+\.?\d*)(?:\s*\[([HLhl\*])\])?\s*([\w/%\.]+))?$', line)
+            test_name_match = _DOCUMENT_TEST_NAME_RE.match(line)
             if test_name_match:
                 name = test_name_match.group(1).strip()
                 value = test_name_match.group(2)
@@ -479,7 +595,7 @@ class MedicalDocumentParser:
                     test_names.append(name)
             
             # Check if line contains a value and reference range
-            elif test_names and re.match(r'^\s*[\d\.]+\s*\[?[HLhl\*]?\]?\s*[\w/%\.]+\s*(?:[\d\.-]+\s*-\s*[\d\.]+)?', line):
+            elif test_names and _DOCUMENT_VALUE_LINE_RE.match(line):
                 parts = line.split()
                 value = parts[0]
                 flag = ""
@@ -487,7 +603,7 @@ class MedicalDocumentParser:
                 ref_range = None
                 
                 # Extract flag if present
-                if len(parts) > 1 and re.match(r'\[[HLhl\*]\]', parts[1]):
+                if len(parts) > 1 and _BRACKETED_FLAG_RE.match(parts[1]):
                     flag = parts[1].strip('[]')
                     parts = parts[0:1] + parts[2:]
                 
@@ -498,7 +614,7 @@ class MedicalDocumentParser:
                     ref_range = ' '.join(parts[2:])
                 
                 # Match with the last unmatched test name
-                test_name = test_names.pop(0)
+                test_name = test_names.popleft()
                 results.append(TestResult(
                     test_name=self.clean_test_name(test_name),
                     value=value,
@@ -510,7 +626,7 @@ class MedicalDocumentParser:
                 ))
             
             # Handle reference ranges on separate lines
-            elif results and re.match(r'^\s*[\d\.-]+\s*-\s*[\d\.]+\s*[\w/%\.]+', line):
+            elif results and _DOCUMENT_RANGE_LINE_RE.match(line):
                 parts = line.split()
                 if len(parts) >= 2:
                     range_str = ' '.join(parts[:-1])
@@ -531,7 +647,7 @@ class MedicalDocumentParser:
         
         for line in lines:
             # If line contains a number and unit, it's likely a complete test result
-            if re.search(r'\d+\.?\d*\s*[a-zA-Z/%]+', line):
+            if _VALUE_WITH_UNIT_RE.search(line):
                 if current_line:
                     processed_lines.append(current_line)
                 current_line = line
@@ -546,7 +662,7 @@ class MedicalDocumentParser:
             result = self.extract_test_data_from_line(line)
             if result:
                 # Add section context if missing
-                if section_name and not any(p.lower() in result.test_name.lower() for p in self.test_patterns):
+                if section_name and not self.test_pattern_re.search(result.test_name.lower()):
                     result.test_name = f"{section_name} {result.test_name}"
                 results.append(result)
         
@@ -560,30 +676,21 @@ class MedicalDocumentParser:
             category = 'other'  # Default category
             test_name_lower = result.test_name.lower()
             
-            # Check each category's tests
-            for cat, tests in self.test_categories.items():
-                if any(test.lower() in test_name_lower for test in tests):
-                    category = cat
-                    break
-                    
-            # Special case handling for common test names
-            if any(term in test_name_lower for term in ['blood count', 'cbc', 'complete blood']):
-                category = 'hematology'
-            elif any(term in test_name_lower for term in ['kidney', 'renal', 'kft']):
-                category = 'chemistry'
-            elif any(term in test_name_lower for term in ['liver', 'hepatic', 'lft']):
-                category = 'liver'
-            elif any(term in test_name_lower for term in ['thyroid', 'tsh', 't3', 't4']):
-                category = 'thyroid'
-            elif any(term in test_name_lower for term in ['lipid', 'cholesterol', 'triglyceride']):
-                category = 'lipid'
-            elif any(term in test_name_lower for term in ['sugar', 'glucose', 'hba1c']):
-                category = 'diabetes'
+            # Special case handling for common test names wins over the category tests,
+            # so check it first; one combined search rules out names that hit none of it
+            if _ANY_CATEGORY_OVERRIDE_RE.search(test_name_lower):
+                for cat, terms_re in _CATEGORY_OVERRIDES:
+                    if terms_re.search(test_name_lower):
+                        category = cat
+                        break
             
-            # Initialize category if not exists
-            if category not in categorized:
-                categorized[category] = []
+            # Check each category's tests; recognized_test_re covers all of them at once
+            elif self.recognized_test_re.search(test_name_lower):
+                for cat, tests_re in self.category_res:
+                    if tests_re.search(test_name_lower):
+                        category = cat
+                        break
             
-            categorized[category].append(result)
+            categorized.setdefault(category, []).append(result)
         
         return categorized
\ No newline at end of file
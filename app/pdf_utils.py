@@ -4,27 +4,64 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 import os
+import re
 import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import groupby
 
 logger = logging.getLogger(__name__)
 
-# Define the PDF output directory
-PDF_OUTPUT_DIR = "C:\\Users\\Aditya\\Desktop\\pdf reports"
+# Define the PDF output directory (override with the PDF_OUTPUT_DIR environment variable)
+PDF_OUTPUT_DIR = os.environ.get("PDF_OUTPUT_DIR", "C:\\Users\\Aditya\\Desktop\\pdf reports")
+
+_output_dir_ready = False
 
 def ensure_output_dir():
-    """Ensure the PDF output directory exists."""
-    if not os.path.exists(PDF_OUTPUT_DIR):
-        os.makedirs(PDF_OUTPUT_DIR)
-        logger.info(f"Created PDF output directory at {PDF_OUTPUT_DIR}")
+    """Ensure the PDF output directory exists, checking the filesystem only until it does."""
+    global _output_dir_ready
+    if _output_dir_ready:
+        return
+    os.makedirs(PDF_OUTPUT_DIR, exist_ok=True)
+    _output_dir_ready = True
+    logger.info(f"PDF output directory ready at {PDF_OUTPUT_DIR}")
+
+# Report styles are identical for every report, so build them once
+_STYLES = getSampleStyleSheet()
+_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=16,
+    spaceAfter=30
+)
+_BASE_TABLE_STYLE_COMMANDS = (
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+)
+
+# Anything but letters, digits, spaces, hyphens and underscores (\w is Unicode-aware, like str.isalnum)
+_UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w \-]+')
 
 def generate_unique_filename(patient_name):
     """Generate a unique filename for the PDF."""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     # Clean patient name to be filesystem safe
-    safe_name = "".join(c for c in patient_name if c.isalnum() or c in (' ', '-', '_')).strip()
+    safe_name = _UNSAFE_FILENAME_CHARS_RE.sub('', patient_name).strip()
     safe_name = safe_name.replace(' ', '_')
-    return f"lab_report_{safe_name}_{timestamp}.pdf"
+    # Random suffix so concurrent reports for the same patient in the same second don't collide
+    return f"lab_report_{safe_name}_{timestamp}_{uuid.uuid4().hex[:8]}.pdf"
 
 def create_lab_report_pdf(data, patient_name, output_path=None):
     """
@@ -40,7 +77,6 @@ def create_lab_report_pdf(data, patient_name, output_path=None):
         str: Path to the generated PDF
     """
     try:
-        # Ensure output directory exists
         ensure_output_dir()
         
         # If no output path is provided, generate one
@@ -65,21 +101,18 @@ def create_lab_report_pdf(data, patient_name, output_path=None):
         elements = []
         
         # Add title
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30
-        )
-        elements.append(Paragraph(f"Laboratory Test Results - {patient_name}", title_style))
+        elements.append(Paragraph(f"Laboratory Test Results - {patient_name}", _TITLE_STYLE))
         elements.append(Spacer(1, 12))
         
         # Prepare table data
         table_data = [['Test Name', 'Value', 'Reference Range', 'Unit', 'Status']]
+        out_of_range_rows = []
         
-        for test in data:
-            status = "OUT OF RANGE" if test.get("lab_test_out_of_range") else "NORMAL"
+        for row_num, test in enumerate(data, start=1):
+            out_of_range = test.get("lab_test_out_of_range")
+            status = "OUT OF RANGE" if out_of_range else "NORMAL"
+            if out_of_range:
+                out_of_range_rows.append(row_num)
             row = [
                 test.get("test_name", ""),
                 test.get("test_value", ""),
@@ -93,29 +126,15 @@ def create_lab_report_pdf(data, patient_name, output_path=None):
         table = Table(table_data, colWidths=[2*inch, inch, 1.5*inch, inch, 1.2*inch])
         
         # Add style
-        style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ])
+        style_commands = list(_BASE_TABLE_STYLE_COMMANDS)
         
-        # Add conditional formatting for out-of-range values
-        for row_num, row in enumerate(table_data[1:], start=1):
-            if row[-1] == "OUT OF RANGE":
-                style.add('TEXTCOLOR', (1, row_num), (1, row_num), colors.red)
-                style.add('TEXTCOLOR', (-1, row_num), (-1, row_num), colors.red)
+        # Add conditional formatting for out-of-range values, one command per run of consecutive rows
+        for _, run in groupby(enumerate(out_of_range_rows), lambda pair: pair[1] - pair[0]):
+            run = [row_num for _, row_num in run]
+            style_commands.append(('TEXTCOLOR', (1, run[0]), (1, run[-1]), colors.red))
+            style_commands.append(('TEXTCOLOR', (-1, run[0]), (-1, run[-1]), colors.red))
         
-        table.setStyle(style)
+        table.setStyle(TableStyle(style_commands))
         elements.append(table)
         
         # Build PDF
@@ -126,3 +145,27 @@ def create_lab_report_pdf(data, patient_name, output_path=None):
     except Exception as e:
         logger.error(f"Error generating PDF report: {str(e)}")
         raise
+
+def _render_report(job):
+    """Render one (data, patient_name) job. Module-level so process pool workers can unpickle it."""
+    data, patient_name = job
+    return create_lab_report_pdf(data, patient_name)
+
+def create_lab_reports_pdf_batch(jobs, max_workers=None):
+    """
+    Create several PDF reports in parallel worker processes.
+    
+    Args:
+        jobs (iterable): (data, patient_name) pairs, as passed to create_lab_report_pdf
+        max_workers (int, optional): Number of worker processes. Defaults to the CPU count.
+    
+    Returns:
+        list: Paths to the generated PDFs, in job order
+    """
+    jobs = list(jobs)
+    if len(jobs) < 2:
+        # Not worth starting a pool for a single report
+        return [_render_report(job) for job in jobs]
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_render_report, jobs))
@@ -1,13 +1,30 @@
+import functools
 import logging
+import re
+import numpy as np
 from .ocr_utils import extract_text_with_easyocr, clean_ocr_text
 
 logger = logging.getLogger(__name__)
 
-def format_result(res):
-    """Format a test result with improved out-of-range detection."""
-    # Get the raw value and any flag
+# Characters that mark a result as out of range, in an explicit flag or embedded in the value
+_OUT_OF_RANGE_FLAG_CHARS = frozenset('HL*↑↓')
+
+_DIGIT_RE = re.compile(r'\d')
+
+# En-dash and minus sign both read as a range hyphen
+_RANGE_DASH_TABLE = str.maketrans({'–': '-', '−': '-'})
+
+def _may_be_float(text):
+    """Return False only for strings float() is certain to reject, so qualitative values skip the exception."""
+    if _DIGIT_RE.search(text):
+        return True
+    lowered = text.lower()
+    return 'inf' in lowered or 'nan' in lowered
+
+def _format_fields(res):
+    """Map a parsed result onto the response fields, without the range check."""
+    # Get the raw value
     test_value = res.get("value", "")
-    flag = res.get("flag", "")
     
     # Handle the case where the value might include a flag
     if isinstance(test_value, str):
@@ -18,14 +35,147 @@ def format_result(res):
         "test_value": test_value,
         "bio_reference_range": res.get("ref_range"),
         "test_unit": res.get("unit"),
-        "lab_test_out_of_range": is_test_out_of_range(
-            test_value,
-            res.get("ref_range"),
-            flag
-        )
     }
 
-def is_test_out_of_range(value, ref_range, flag=''):
+def format_result(res):
+    """Format a test result with improved out-of-range detection."""
+    formatted = _format_fields(res)
+    formatted["lab_test_out_of_range"] = is_test_out_of_range(
+        formatted["test_value"],
+        res.get("ref_range"),
+        res.get("flag", ""),
+        _already_clean=True
+    )
+    return formatted
+
+def format_results(results):
+    """
+    Format a list of test results, checking plain numeric "low-high" ranges in one vectorized pass.
+    
+    Results that are a bare number against a two-sided range are compared
+    together as NumPy arrays; every other shape goes through is_test_out_of_range.
+    """
+    formatted = []
+    numeric_rows = []
+    operands = []
+    
+    for res in results:
+        row = _format_fields(res)
+        numeric = _numeric_range_operands(row["test_value"], res.get("ref_range"), res.get("flag", ""))
+        if numeric is None:
+            row["lab_test_out_of_range"] = is_test_out_of_range(
+                row["test_value"],
+                res.get("ref_range"),
+                res.get("flag", ""),
+                _already_clean=True
+            )
+        else:
+            numeric_rows.append(row)
+            operands.append(numeric)
+        formatted.append(row)
+    
+    if operands:
+        values, lows, highs = np.array(operands, dtype=np.float64).T
+        out_of_range = (values < lows) | (values > highs)
+        for row, oor in zip(numeric_rows, out_of_range.tolist()):
+            row["lab_test_out_of_range"] = oor
+    
+    return formatted
+
+def _numeric_range_operands(value, ref_range, flag=''):
+    """
+    Return (value, low, high) floats when is_test_out_of_range would decide the result
+    by a plain numeric comparison against a two-sided range, otherwise None.
+    
+    Expects a value already cleaned by _format_fields.
+    """
+    if not value or not ref_range or not isinstance(value, str):
+        return None
+    
+    # Explicit or embedded flags decide the result without a numeric comparison
+    if flag and not _OUT_OF_RANGE_FLAG_CHARS.isdisjoint(flag.upper()):
+        return None
+    if not _OUT_OF_RANGE_FLAG_CHARS.isdisjoint(value):
+        return None
+    
+    if '<' in value or '>' in value:
+        return None
+    
+    if not _may_be_float(value):
+        return None
+    
+    parsed_range = _parse_reference_range(ref_range)
+    if parsed_range is None or parsed_range[0] != 'between':
+        return None
+    
+    try:
+        return float(value), parsed_range[1], parsed_range[2]
+    except ValueError:
+        return None
+
+@functools.lru_cache(maxsize=4096)
+def _parse_reference_range(ref_range):
+    """
+    Parse a reference range string once per distinct string.
+    
+    Returns ('between', low, high), ('max', limit), ('min', limit),
+    ('qualitative', lowercased_range) or None when the range gives no numeric verdict.
+    """
+    # Standardize the reference range format
+    ref_range = ref_range.strip().translate(_RANGE_DASH_TABLE)
+    ref_lower = ref_range.lower()
+    
+    # Try different range formats
+    if '-' in ref_range:
+        # Handle hyphen format (e.g., "0.0-7.0")
+        parts = ref_range.split('-')
+        if len(parts) == 2:
+            try:
+                low, high = map(float, parts)
+                return ('between', low, high)
+            except ValueError:
+                # If conversion fails, might be a complex range
+                pass
+                
+    elif ' ' in ref_range and len(ref_range.split()) == 2:
+        # Handle space-separated format (e.g., "0.0 7.0")
+        try:
+            low, high = map(float, ref_range.split())
+            return ('between', low, high)
+        except ValueError:
+            pass
+            
+    elif 'to' in ref_lower:
+        # Handle 'to' format (e.g., "0.0 to 7.0")
+        parts = ref_lower.split('to')
+        try:
+            low = float(parts[0].strip())
+            high = float(parts[1].strip())
+            return ('between', low, high)
+        except ValueError:
+            pass
+            
+    # Check for comparison format
+    elif '<' in ref_range or '≤' in ref_range:
+        try:
+            return ('max', float(ref_range.replace('<', '').replace('≤', '').strip()))
+        except ValueError:
+            pass
+            
+    elif '>' in ref_range or '≥' in ref_range:
+        try:
+            return ('min', float(ref_range.replace('>', '').replace('≥', '').strip()))
+        except ValueError:
+            pass
+            
+    # Handle ranges with text (e.g., "Negative" or "Non-reactive")
+    elif any(word in ref_lower for word in ['negative', 'non-reactive', 'normal']):
+        # These are typically qualitative tests
+        return ('qualitative', ref_lower)
+    
+    return None
+
+def is_test_out_of_range(value, ref_range, flag='', *, _already_clean=False):
     """
     Determine if a test value is out of range based on the reference range and flags.
     
@@ -33,6 +183,7 @@ def is_test_out_of_range(value, ref_range, flag=''):
         value (str): The test value
         ref_range (str): The reference range
         flag (str): Any flag associated with the value ('H', 'L', '*', etc.)
+        _already_clean (bool): The caller already stripped asterisks and whitespace from a str value
     
     Returns:
         bool: True if the value is out of range, False otherwise
@@ -42,84 +193,53 @@ def is_test_out_of_range(value, ref_range, flag=''):
         return False
 
     # First check if there's an explicit flag indicating out of range
-    if flag and any(f in flag.upper() for f in ['H', 'L', '*', '↑', '↓']):
+    if flag and not _OUT_OF_RANGE_FLAG_CHARS.isdisjoint(flag.upper()):
         return True
         
     # Check if the value has an asterisk or flag embedded
-    if isinstance(value, str) and any(char in value for char in ['*', 'H', 'L', '↑', '↓']):
+    if isinstance(value, str) and not _OUT_OF_RANGE_FLAG_CHARS.isdisjoint(value):
         return True
     
     try:
         # Clean the value and convert to float
-        cleaned_value = str(value).replace('*', '').strip()
+        if _already_clean and isinstance(value, str):
+            cleaned_value = value
+        else:
+            cleaned_value = str(value).replace('*', '').strip()
         
         # Handle special cases like "<0.01" in the value
-        if any(char in cleaned_value for char in ['<', '>']):
+        if '<' in cleaned_value or '>' in cleaned_value:
             # For now, treat these as in range as they're usually within acceptable limits
             return False
+        
+        # Qualitative values ("Negative", "Non-reactive") go straight to the string comparison
+        if not _may_be_float(cleaned_value):
+            return _differs_from_reference(value, ref_range)
             
         val = float(cleaned_value)
         
         # If we have a reference range, parse it
         if ref_range:
-            # Standardize the reference range format
-            ref_range = ref_range.strip().replace('–', '-')  # Handle en-dash
-            ref_range = ref_range.replace('−', '-')  # Handle minus sign
-            
-            # Try different range formats
-            if '-' in ref_range:
-                # Handle hyphen format (e.g., "0.0-7.0")
-                parts = ref_range.split('-')
-                if len(parts) == 2:
-                    try:
-                        low, high = map(float, parts)
-                        return val < low or val > high
-                    except ValueError:
-                        # If conversion fails, might be a complex range
-                        pass
-                        
-            elif ' ' in ref_range and len(ref_range.split()) == 2:
-                # Handle space-separated format (e.g., "0.0 7.0")
-                try:
-                    low, high = map(float, ref_range.split())
+            parsed_range = _parse_reference_range(ref_range)
+            if parsed_range is not None:
+                kind = parsed_range[0]
+                if kind == 'between':
+                    _, low, high = parsed_range
                     return val < low or val > high
-                except ValueError:
-                    pass
-                    
-            elif 'to' in ref_range.lower():
-                # Handle 'to' format (e.g., "0.0 to 7.0")
-                parts = ref_range.lower().split('to')
-                try:
-                    low = float(parts[0].strip())
-                    high = float(parts[1].strip())
-                    return val < low or val > high
-                except ValueError:
-                    pass
-                    
-            # Check for comparison format
-            elif '<' in ref_range or '≤' in ref_range:
-                try:
-                    limit = float(ref_range.replace('<', '').replace('≤', '').strip())
-                    return val > limit  # If reference is "<10", then 11 is out of range
-                except ValueError:
-                    pass
-                    
-            elif '>' in ref_range or '≥' in ref_range:
-                try:
-                    limit = float(ref_range.replace('>', '').replace('≥', '').strip())
-                    return val < limit  # If reference is ">20", then 19 is out of range
-                except ValueError:
-                    pass
-                    
-            # Handle ranges with text (e.g., "Negative" or "Non-reactive")
-            elif any(word in ref_range.lower() for word in ['negative', 'non-reactive', 'normal']):
-                # These are typically qualitative tests
-                # Consider them out of range if they don't match exactly
-                return str(value).lower() not in ref_range.lower()
+                if kind == 'max':
+                    return val > parsed_range[1]  # If reference is "<10", then 11 is out of range
+                if kind == 'min':
+                    return val < parsed_range[1]  # If reference is ">20", then 19 is out of range
+                if kind == 'qualitative':
+                    # Consider them out of range if they don't match exactly
+                    return str(value).lower() not in parsed_range[1]
                 
     except (ValueError, TypeError):
         # If we can't parse the numbers, fall back to string comparison
-        if ref_range and str(value).strip().lower() != ref_range.strip().lower():
-            return True
+        return _differs_from_reference(value, ref_range)
         
     return False
+
+def _differs_from_reference(value, ref_range):
+    """String comparison used when the value or the reference range is not numeric."""
+    return bool(ref_range) and str(value).strip().lower() != ref_range.strip().lower()